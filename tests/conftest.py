@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,13 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def thumbnails(settings, tmp_path):
+    """
+    Миниатюры строятся в потоке теста, а записи о них пишутся
+    во временный файл, а не в проект.
+    """
+    settings.THUMBNAIL_WORKERS = 0
+    settings.THUMBNAIL_KVSTORE_FILE = str(tmp_path / 'thumbnails.sqlite3')
@@ -0,0 +1,43 @@
+"""
+Обёртка бэкенда кэша, считающая попадания и промахи в замер запроса.
+
+Настоящий бэкенд задаётся в OPTIONS['BACKEND'], остальные OPTIONS
+и LOCATION передаются ему как есть:
+
+    'BACKEND': 'core.cache.InstrumentedCache',
+    'LOCATION': '127.0.0.1:11211',
+    'OPTIONS': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+    },
+"""
+from django.utils.module_loading import import_string
+
+from . import timing
+
+MISSING = object()
+
+
+class InstrumentedCache:
+    """Передаёт вызовы бэкенду и считает исход get/get_many."""
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = import_string(options.pop('BACKEND'))
+        self._cache = backend(location, {**params, 'OPTIONS': options})
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, MISSING, version=version)
+        timing.add_cache(value is not MISSING, value is MISSING)
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._cache.get_many(keys, version=version)
+        timing.add_cache(len(values), len(keys) - len(values))
+        return values
@@ -0,0 +1,159 @@
+"""
+Раздача загруженных файлов (MEDIA_ROOT) в работе.
+
+Условные запросы (ETag, Last-Modified) отвечаются 304 без открытия
+файла. Сами байты Python-воркер не копирует, в зависимости
+от settings.MEDIA_SERVE_MODE:
+
+- sendfile: ответ отдаёт открытый файл, и WSGI-сервер с
+  wsgi.file_wrapper (gunicorn, uWSGI) шлёт его через os.sendfile,
+  в том числе кусок для запроса Range;
+- x-accel-redirect: nginx получает внутренний адрес
+  MEDIA_ACCEL_PREFIX + путь и сам отдаёт файл и Range;
+- x-sendfile: то же для Apache (mod_xsendfile) и lighttpd
+  по абсолютному пути.
+"""
+import mimetypes
+import os
+import re
+import stat
+from http import HTTPStatus
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+SENDFILE = 'sendfile'
+X_ACCEL_REDIRECT = 'x-accel-redirect'
+X_SENDFILE = 'x-sendfile'
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Имя - хэш содержимого (posts.storage, миниатюры sorl): файл под ним
+# не меняется, и кэшировать его можно навсегда.
+HASHED_NAME = re.compile(r'^[0-9a-f]{32,}$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class FileRange:
+    """
+    Файл, из которого читается не больше length байт с текущей позиции.
+    fileno отдаёт дескриптор, чтобы WSGI-сервер мог отправить кусок
+    через os.sendfile: его длину он берёт из Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_hashed(path):
+    return bool(HASHED_NAME.match(
+        os.path.splitext(os.path.basename(path))[0]))
+
+
+def etag(path, stat_result):
+    if is_hashed(path):
+        return '"{}"'.format(os.path.splitext(os.path.basename(path))[0])
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def byte_range(request, tag, mtime, size):
+    """
+    Запрошенный диапазон (start, end) включительно, None для всего
+    файла или False, если диапазон невыполним. Несколько диапазонов
+    в одном запросе не поддерживаются и дают весь файл.
+    """
+    match = RANGE.match(request.META.get('HTTP_RANGE', '').strip())
+    if match is None:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != tag and (
+            parse_http_date_safe(if_range) != int(mtime)):
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # bytes=-N: последние N байт.
+        if not int(end):
+            return False
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+def serve(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+    tag = etag(fullpath, stat_result)
+    mtime = stat_result.st_mtime
+    size = stat_result.st_size
+    response = get_conditional_response(
+        request, etag=tag, last_modified=int(mtime))
+    if response is None:
+        response = _file_response(request, path, fullpath, tag, mtime, size)
+    response['ETag'] = tag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = (
+        IMMUTABLE if is_hashed(path)
+        else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}')
+    return response
+
+
+def _file_response(request, path, fullpath, tag, mtime, size):
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(
+            path.replace(os.sep, '/'))
+        return response
+    if mode == X_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+        return response
+    requested = byte_range(request, tag, mtime, size)
+    if requested is False:
+        response = HttpResponse(
+            status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(fullpath, 'rb')
+    start, end = requested or (0, size - 1)
+    file.seek(start)
+    response = FileResponse(
+        FileRange(file, end - start + 1), content_type=content_type)
+    response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    if requested:
+        response.status_code = HTTPStatus.PARTIAL_CONTENT
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
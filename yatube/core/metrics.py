@@ -0,0 +1,91 @@
+"""
+Метрики запросов по маршрутам в текстовом формате Prometheus.
+
+Гистограммы живут в памяти процесса: при нескольких воркерах каждый
+отдаёт свои, а суммирует их Prometheus.
+"""
+import bisect
+import threading
+
+BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+HISTOGRAMS = (
+    ('yatube_request_duration_seconds', 'total',
+     'Время ответа по маршрутам.'),
+    ('yatube_sql_duration_seconds', 'sql',
+     'Время SQL-запросов за ответ.'),
+    ('yatube_template_duration_seconds', 'template',
+     'Время рендера шаблонов за ответ.'),
+)
+COUNTERS = (
+    ('yatube_sql_queries_total', 'sql_count', 'Число SQL-запросов.'),
+    ('yatube_cache_hits_total', 'cache_hits', 'Попадания в кэш.'),
+    ('yatube_cache_misses_total', 'cache_misses', 'Промахи кэша.'),
+)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, view):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            cumulative += count
+            yield f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{view="{view}",le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{view="{view}"}} {self.sum}'
+        yield f'{name}_count{{view="{view}"}} {self.count}'
+
+
+def observe(view, timings):
+    """Добавляет замеры одного ответа (timing.RequestTimings)."""
+    with _lock:
+        for name, field, _ in HISTOGRAMS:
+            histogram = _histograms.get((name, view))
+            if histogram is None:
+                histogram = _histograms[name, view] = Histogram()
+            histogram.observe(getattr(timings, field))
+        for name, field, _ in COUNTERS:
+            _counters[name, view] = (
+                _counters.get((name, view), 0) + getattr(timings, field))
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def render():
+    lines = []
+    with _lock:
+        for name, _, description in HISTOGRAMS:
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} histogram']
+            for (metric, view), histogram in sorted(_histograms.items()):
+                if metric == name:
+                    lines += histogram.lines(name, view)
+        for name, _, description in COUNTERS:
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} counter']
+            lines += [
+                f'{name}{{view="{view}"}} {value}'
+                for (metric, view), value in sorted(_counters.items())
+                if metric == name
+            ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics, query_budget, timing
+
+UNRESOLVED = 'unresolved'
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает SQL-запросы запроса и сверяет их с бюджетом маршрута.
+
+    Стоит в начале MIDDLEWARE, чтобы в счёт попали и запросы сессии
+    и пользователя.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.QUERY_BUDGET_MODE == query_budget.OFF:
+            return self.get_response(request)
+        with query_budget.capture() as log:
+            response = self.get_response(request)
+        query_budget.check(request, log.queries)
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Замеряет запрос: общее время, SQL, шаблоны и кэш. Отдаёт замеры
+    в заголовке Server-Timing и копит их по маршрутам для /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.start()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timing.time_sql):
+                response = self.get_response(request)
+        finally:
+            timing.stop()
+        timings.total = time.perf_counter() - started
+        response['Server-Timing'] = timings.header()
+        match = request.resolver_match
+        metrics.observe(
+            match.view_name if match is not None else UNRESOLVED, timings)
+        return response
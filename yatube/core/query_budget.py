@@ -0,0 +1,82 @@
+"""
+Бюджеты SQL-запросов для именованных маршрутов.
+
+Бюджеты объявлены в settings.QUERY_BUDGETS: имя маршрута
+('posts:index') - либо число запросов на любой метод, либо словарь
+{'GET': ..., 'POST': ...}. QueryBudgetMiddleware считает запросы
+каждого HTTP-запроса и в режиме settings.QUERY_BUDGET_MODE = 'log'
+пишет превышения в лог вместе с SQL, а в режиме 'raise' (тесты,
+см. core.testing) бросает QueryBudgetExceeded.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+OFF = 'off'
+LOG = 'log'
+RAISE = 'raise'
+
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Маршрут выполнил больше SQL-запросов, чем ему положено."""
+
+
+def budget_for(view_name, method):
+    """Бюджет маршрута для метода или None, если он не объявлен."""
+    budget = settings.QUERY_BUDGETS.get(view_name)
+    if isinstance(budget, dict):
+        return budget.get(method)
+    return budget
+
+
+class QueryLog:
+    """
+    Обёртка execute_wrapper, запоминающая SQL выполненных запросов.
+
+    Точки сохранения не считаются: в тестах каждый atomic() становится
+    SAVEPOINT, и без этого бюджеты в тестах и в работе расходились бы.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(TRANSACTION_CONTROL):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def capture():
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        yield log
+
+
+def describe(view_name, method, budget, queries):
+    lines = [
+        f'{method} {view_name}: {len(queries)} SQL-запросов '
+        f'при бюджете {budget}'
+    ]
+    lines += [f'  {number}. {sql}' for number, sql in enumerate(queries, 1)]
+    return '\n'.join(lines)
+
+
+def check(request, queries):
+    """Сверяет число запросов с бюджетом маршрута запроса."""
+    match = request.resolver_match
+    if match is None:
+        return
+    budget = budget_for(match.view_name, request.method)
+    if budget is None or len(queries) <= budget:
+        return
+    message = describe(match.view_name, request.method, budget, queries)
+    if settings.QUERY_BUDGET_MODE == RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
@@ -0,0 +1,33 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django
+
+from . import timing
+
+
+class Template(django.Template):
+    """
+    Шаблон, время рендера которого идёт в замер запроса.
+
+    Вложенные {% include %} рендерятся движком напрямую, поэтому
+    считается только шаблон верхнего уровня и время не удваивается.
+    """
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.add_template(time.perf_counter() - started)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django.reraise(exc, self)
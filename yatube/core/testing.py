@@ -0,0 +1,7 @@
+"""Помощники тестов; в рабочем коде не импортируются."""
+from django.test.utils import override_settings
+
+from .query_budget import RAISE
+
+# Превышение бюджета SQL-запросов валит тест, а не пишется в лог.
+enforce_query_budget = override_settings(QUERY_BUDGET_MODE=RAISE)
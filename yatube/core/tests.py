@@ -1,6 +1,28 @@
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
+from importlib import import_module
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+from . import media, metrics, query_budget
+from .testing import enforce_query_budget
+
+User = get_user_model()
+
+BUDGETED_APPS = ('posts', 'users', 'about')
+PASSWORD = 'Very$tr0ngPass'
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(100))
+HASHED = 'a' * 64
+TOKEN = 'metrics-token'
 
 
 class ViewTestClass(TestCase):
@@ -9,3 +31,317 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+def named_routes():
+    for app in BUDGETED_APPS:
+        urls = import_module(f'{app}.urls')
+        for pattern in urls.urlpatterns:
+            yield f'{urls.app_name}:{pattern.name}', pattern
+
+
+@enforce_query_budget
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(
+            username='user', email='user@yatube.ru', password=PASSWORD)
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+            description='test_description',
+        )
+        for number in range(12):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group)
+        cls.own_post = Post.objects.create(
+            author=cls.user, text='Свой пост', group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий')
+        Follow.objects.create(user=cls.author, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def route_kwargs(self, name, pattern):
+        if name == 'posts:post_edit':
+            return {'post_id': self.own_post.pk}
+        values = {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': self.post.pk,
+            'uidb64': 'MQ',
+            'token': 'set-password',
+        }
+        return {key: values[key] for key in pattern.pattern.converters}
+
+    def test_every_route_has_budget(self):
+        """Проверка: у каждого именованного маршрута объявлен бюджет."""
+        for name, _ in named_routes():
+            with self.subTest(name=name):
+                self.assertIn(name, settings.QUERY_BUDGETS)
+
+    def test_pages_fit_budget(self):
+        """Проверка: страницы укладываются в бюджет запросов."""
+        for name, pattern in named_routes():
+            url = reverse(name, kwargs=self.route_kwargs(name, pattern))
+            for client in (self.guest_client, self.authorized_client):
+                with self.subTest(name=name):
+                    cache.clear()
+                    # Выход на предыдущем шаге разлогинивает клиента.
+                    self.authorized_client.force_login(self.user)
+                    client.get(url)
+
+    def test_forms_fit_budget(self):
+        """Проверка: отправка форм укладывается в бюджет запросов."""
+        forms = (
+            ('posts:post_create', {},
+             {'text': 'Новый пост', 'group': self.group.pk}),
+            ('posts:post_edit', {'post_id': self.own_post.pk},
+             {'text': 'Правка', 'group': self.group.pk}),
+            ('posts:add_comment', {'post_id': self.post.pk},
+             {'text': 'Ещё комментарий'}),
+            ('users:password_change', {}, {
+                'old_password': PASSWORD,
+                'new_password1': 'Other$tr0ngPass',
+                'new_password2': 'Other$tr0ngPass',
+            }),
+            ('users:logout', {}, {}),
+        )
+        for name, kwargs, data in forms:
+            with self.subTest(name=name):
+                self.authorized_client.force_login(
+                    User.objects.get(pk=self.user.pk))
+                response = self.authorized_client.post(
+                    reverse(name, kwargs=kwargs), data)
+                self.assertLess(response.status_code, HTTPStatus.BAD_REQUEST)
+        guest_forms = (
+            ('users:signup', {
+                'first_name': 'Имя',
+                'last_name': 'Фамилия',
+                'username': 'new_user',
+                'email': 'new@yatube.ru',
+                'password1': PASSWORD,
+                'password2': PASSWORD,
+            }),
+            ('users:login', {
+                'username': 'new_user', 'password': PASSWORD}),
+            ('users:password_reset', {'email': 'user@yatube.ru'}),
+        )
+        for name, data in guest_forms:
+            with self.subTest(name=name):
+                response = self.guest_client.post(reverse(name), data)
+                self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    @override_settings(QUERY_BUDGETS={'about:author': 0})
+    def test_over_budget_raises_in_tests(self):
+        """Проверка: превышение бюджета в тестах - ошибка."""
+        with self.assertRaises(query_budget.QueryBudgetExceeded):
+            self.authorized_client.get(reverse('about:author'))
+
+    @override_settings(
+        QUERY_BUDGETS={'about:author': 0},
+        QUERY_BUDGET_MODE=query_budget.LOG,
+    )
+    def test_over_budget_is_logged_with_sql(self):
+        """Проверка: в рабочем режиме превышение пишется в лог с SQL."""
+        with self.assertLogs('core.query_budget', 'WARNING') as logs:
+            response = self.authorized_client.get(reverse('about:author'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            'GET about:author: 2 SQL-запросов при бюджете 0', logs.output[0])
+        self.assertIn('django_session', logs.output[0])
+
+
+@override_settings(METRICS_TOKEN=TOKEN)
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.guest_client = Client()
+
+    def timings(self, response):
+        return dict(
+            part.split(';', 1)
+            for part in response['Server-Timing'].split(', '))
+
+    def test_server_timing_header(self):
+        """Проверка: ответ несёт время, SQL, шаблоны и обращения к кэшу."""
+        response = self.guest_client.get(reverse('posts:index'))
+        timings = self.timings(response)
+        self.assertEqual(
+            set(timings), {'total', 'sql', 'template', 'cache'})
+        self.assertRegex(timings['sql'], r'^dur=[\d.]+;desc="1 queries"$')
+        self.assertRegex(timings['template'], r'^dur=[\d.]+$')
+        self.assertNotIn('miss=0', timings['cache'])
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('desc="0 queries"', self.timings(response)['sql'])
+        self.assertIn('miss=0', self.timings(response)['cache'])
+
+    def test_metrics_aggregated_by_view(self):
+        """Проверка: /metrics отдаёт гистограммы по маршрутам."""
+        for _ in range(3):
+            self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('about:tech'))
+        response = self.guest_client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      content)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 3',
+            content)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 3', content)
+        self.assertIn('yatube_sql_queries_total{view="posts:index"} 1',
+                      content)
+        self.assertIn('view="about:tech"', content)
+
+    def test_metrics_need_token_or_staff(self):
+        """Проверка: метрики отдаются только по токену или сотруднику."""
+        url = reverse('metrics')
+        for name, headers in (
+            ('без токена', {}),
+            ('чужой токен', {'HTTP_AUTHORIZATION': 'Bearer wrong'}),
+        ):
+            with self.subTest(name=name):
+                response = self.guest_client.get(url, **headers)
+                self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        with self.settings(METRICS_TOKEN=''):
+            response = self.guest_client.get(
+                url, HTTP_AUTHORIZATION='Bearer ')
+            self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        staff_client = Client()
+        staff_client.force_login(
+            User.objects.create_user(username='staff', is_staff=True))
+        self.assertEqual(staff_client.get(url).status_code, HTTPStatus.OK)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_SERVE_MODE=media.SENDFILE)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        for name in ('file.jpg', f'{HASHED}.jpg'):
+            with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', name), 'wb') as f:
+                f.write(CONTENT)
+        cls.url = reverse('media', kwargs={'path': 'posts/file.jpg'})
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, url=None, **headers):
+        return self.client.get(url or self.url, **headers)
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_file_served_with_validators(self):
+        """Проверка: файл отдаётся с ETag, Last-Modified и Accept-Ranges."""
+        response = self.get()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.content(response), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_file_exposed_to_wsgi_file_wrapper(self):
+        """Проверка: WSGI-серверу доступен дескриптор для os.sendfile."""
+        request = RequestFactory().get(self.url, HTTP_RANGE='bytes=10-19')
+        response = media.serve(request, 'posts/file.jpg')
+        with os.fdopen(os.dup(response.file_to_stream.fileno()), 'rb') as f:
+            self.assertEqual(f.tell(), 10)
+        response.close()
+
+    def test_conditional_get(self):
+        """Проверка: совпавшие ETag или дата дают 304 без тела."""
+        response = self.get()
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ):
+            with self.subTest(headers=headers):
+                not_modified = self.get(**headers)
+                self.assertEqual(
+                    not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(
+            self.get(HTTP_IF_NONE_MATCH='"other"').status_code, HTTPStatus.OK)
+
+    def test_byte_ranges(self):
+        """Проверка: Range отдаёт кусок файла с 206."""
+        cases = {
+            'bytes=10-19': (10, 19),
+            'bytes=90-': (90, 99),
+            'bytes=-5': (95, 99),
+            'bytes=95-200': (95, 99),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT)
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/100')
+                self.assertEqual(
+                    self.content(response), CONTENT[start:end + 1])
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1))
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        """Проверка: невыполнимый Range - 416, устаревший If-Range - 200."""
+        response = self.get(HTTP_RANGE='bytes=100-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.content(response), CONTENT)
+
+    def test_hashed_names_are_immutable(self):
+        """Проверка: файл с хэшем в имени кэшируется навсегда."""
+        response = self.get(
+            reverse('media', kwargs={'path': f'posts/{HASHED}.jpg'}))
+        self.assertEqual(response['ETag'], f'"{HASHED}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('immutable', self.get()['Cache-Control'])
+
+    def test_offload_modes(self):
+        """Проверка: в режимах offload файл отдаёт фронтенд-сервер."""
+        with self.settings(MEDIA_SERVE_MODE=media.X_ACCEL_REDIRECT):
+            response = self.get()
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/file.jpg')
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_SERVE_MODE=media.X_SENDFILE):
+            response = self.get()
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(TEMP_MEDIA_ROOT, 'posts', 'file.jpg'))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_missing_and_outside_files(self):
+        """Проверка: нет файла или путь вне MEDIA_ROOT - 404."""
+        for path in ('posts/missing.jpg', 'posts', '../manage.py'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
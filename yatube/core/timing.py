@@ -0,0 +1,69 @@
+"""
+Замеры текущего запроса: общее время, SQL, рендер шаблонов и кэш.
+
+ServerTimingMiddleware открывает замер на время запроса, а хуки
+(обёртка execute_wrapper, бэкенд шаблонов core.template_backends
+и бэкенд кэша core.cache) добавляют в него свои времена и счётчики.
+Вне запроса хуки ничего не делают.
+"""
+import threading
+import time
+
+_local = threading.local()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.total = 0.0
+        self.sql = 0.0
+        self.sql_count = 0
+        self.template = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def header(self):
+        """Значение заголовка Server-Timing, длительности в миллисекундах."""
+        return ', '.join((
+            f'total;dur={self.total * 1000:.1f}',
+            f'sql;dur={self.sql * 1000:.1f};desc="{self.sql_count} queries"',
+            f'template;dur={self.template * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+        ))
+
+
+def start():
+    _local.timings = RequestTimings()
+    return _local.timings
+
+
+def stop():
+    _local.timings = None
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+def time_sql(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings = current()
+        if timings is not None:
+            timings.sql += time.perf_counter() - started
+            timings.sql_count += 1
+
+
+def add_template(duration):
+    timings = current()
+    if timings is not None:
+        timings.template += duration
+
+
+def add_cache(hits, misses):
+    timings = current()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
@@ -1,6 +1,13 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import media as media_files
+from . import metrics as request_metrics
 
 
 def page_not_found(request, exception):
@@ -13,8 +20,29 @@ def csrf_failure(request, reason=''):
 
 
 def server_error(request):
-    return render(request, 'core/500.html', HTTPStatus.INTERNAL_SERVER_ERROR)
+    return render(request, 'core/500.html',
+                  status=HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
 def permission_denied(request, exception):
-    return render(request, 'core/403.html', HTTPStatus.FORBIDDEN)
+    return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
+
+
+def metrics_allowed(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        request_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def media(request, path):
+    return media_files.serve(request, path)
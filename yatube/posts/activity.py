@@ -0,0 +1,43 @@
+"""
+Отметки последних изменений для условных GET (posts.conditional).
+
+Post.updated и Group.last_activity сдвигает auto_now при save(), но
+страница меняется и от чужих записей: комментарий меняет пост, пост -
+ленты группы и автора, подписка - профиль автора. Эти изменения
+сдвигают отметки здесь, одним UPDATE на таблицу.
+
+Имена видны и на чужих страницах: автор - в ленте группы и под своими
+комментариями, группа - в профилях авторов её постов. Переименование
+сдвигает и отметки этих страниц.
+"""
+from django.utils import timezone
+
+from .models import Group, Post, UserStats
+
+
+def touch(post_ids=(), group_ids=(), author_ids=()):
+    now = timezone.now()
+    post_ids = [pk for pk in post_ids if pk is not None]
+    group_ids = [pk for pk in group_ids if pk is not None]
+    author_ids = [pk for pk in author_ids if pk is not None]
+    if post_ids:
+        Post.objects.filter(pk__in=post_ids).update(updated=now)
+    if group_ids:
+        Group.objects.filter(pk__in=group_ids).update(last_activity=now)
+    if author_ids:
+        UserStats.objects.filter(user_id__in=author_ids).update(
+            last_activity=now)
+
+
+def touch_renamed_author(author_id):
+    """Группы с постами автора и посты с его комментариями."""
+    now = timezone.now()
+    Group.objects.filter(posts__author_id=author_id).update(
+        last_activity=now)
+    Post.objects.filter(comments__author_id=author_id).update(updated=now)
+
+
+def touch_renamed_group(group_id):
+    """Профили авторов, у которых есть посты в группе."""
+    UserStats.objects.filter(user__posts__group_id=group_id).update(
+        last_activity=timezone.now())
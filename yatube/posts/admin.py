@@ -1,26 +1,141 @@
+from django import forms
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max
+from django.forms.models import ModelChoiceIterator
+from django.utils.functional import cached_property
 
+from . import search
 from .models import Comment, Follow, Group, Post
 
+# До стольких строк changelist считает их точно, дальше - оценкой
+# по статистике СУБД или по максимальному id.
+EXACT_COUNT_LIMIT = 10000
 
-class PostAdmin(admin.ModelAdmin):
+
+def estimated_count(model):
+    """Примерное число строк таблицы без её просмотра."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [model._meta.db_table])
+            row = cursor.fetchone()
+        return row[0] if row else None
+    return model._default_manager.aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для changelist больших таблиц: без фильтров число строк
+    оценивается, с фильтрами считается, но не дальше EXACT_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:EXACT_COUNT_LIMIT].count()
+
+
+class CachedChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.objects():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.objects()) + (
+            self.field.empty_label is not None)
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """
+    Поле выбора для list_editable: объекты читаются одним запросом
+    и общие для копий поля во всех строках changelist - и для вывода
+    вариантов, и для проверки присланных значений.
+    """
+
+    iterator = CachedChoiceIterator
+
+    def __init__(self, *args, **kwargs):
+        self.shared = {}
+        super().__init__(*args, **kwargs)
+
+    def __deepcopy__(self, memo):
+        result = super().__deepcopy__(memo)
+        result.shared = self.shared
+        return result
+
+    def objects(self):
+        if 'objects' not in self.shared:
+            self.shared['objects'] = list(self.queryset)
+        return self.shared['objects']
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        key = self.to_field_name or 'pk'
+        for obj in self.objects():
+            if str(getattr(obj, key)) == str(value):
+                return obj
+        raise forms.ValidationError(
+            self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Changelist с постоянным числом запросов на страницу: связанные
+    объекты по list_select_related, оценка числа строк, варианты
+    внешних ключей в list_editable - один раз на страницу.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    date_hierarchy = 'pub_date'
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.list_editable:
+            kwargs.setdefault('form_class', CachedModelChoiceField)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class PostAdmin(ScalableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
+    list_select_related = ('author', 'group')
     empty_value_display = '-пусто-'
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всем текстам - полнотекстовый индекс.
+        if not search.enabled():
+            return super().get_search_results(
+                request, queryset, search_term)
+        words = search.terms(search_term)
+        if not words:
+            return queryset, False
+        return queryset.filter(pk__in=search.matching_ids(words)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description',)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdmin):
     list_display = ('post', 'text', 'author', 'pk',)
+    list_select_related = ('post', 'author')
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author',)
+    list_select_related = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,198 @@
+"""
+JSON-версии лент: главная, группа, автор и подписки.
+
+Пост сериализуется вручную в словарь только из запрошенных полей
+(?fields=id,text), без сериализаторов моделей. Страницы листаются
+курсором ?after= / ?before=, как HTML-ленты; размер страницы - ?limit=.
+
+ETag публичных лент строится из состояния ленты в базе и адреса
+запроса: последний изменённый пост (updated, id) по индексу и отметки
+изменений владельца ленты. Удаление поста и переименования сдвигают
+отметки групп и авторов (posts.activity), поэтому главная берёт ещё
+последние из них - тоже по индексам. Это один запрос без перебора
+таблицы, и If-None-Match отвечается 304 до чтения постов одинаково
+во всех процессах. Лента
+подписок требует входа (без него - 401) и своей отметки не имеет:
+её ETag - хэш готового ответа, и 304 экономит только трафик.
+"""
+import hashlib
+import json
+from http import HTTPStatus
+
+from django.db.models import Subquery
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import counters
+from .models import Group, Post, User, UserStats
+from .paginators import CursorPaginator
+from .timeline import feed_paginator
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+}
+# Связи, которые нужно подтянуть для полей.
+RELATED = {'author': 'author', 'group': 'group'}
+
+
+class BadRequest(ValueError):
+    """Неверный параметр запроса; текст уходит клиенту."""
+
+
+def fields(request):
+    requested = request.GET.get('fields')
+    if not requested:
+        return tuple(FIELDS)
+    names = tuple(dict.fromkeys(
+        name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown or not names:
+        raise BadRequest(
+            'Неизвестные поля: {}. Доступны: {}.'.format(
+                ', '.join(unknown), ', '.join(FIELDS)))
+    return names
+
+
+def limit(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    if not 1 <= value <= MAX_LIMIT:
+        raise BadRequest(f'limit должен быть от 1 до {MAX_LIMIT}.')
+    return value
+
+
+def error_response(error, status=HTTPStatus.BAD_REQUEST):
+    return JsonResponse(
+        {'error': str(error)}, status=status,
+        json_dumps_params={'ensure_ascii': False})
+
+
+def related(names):
+    return [RELATED[name] for name in names if name in RELATED]
+
+
+def serialize(post, names):
+    return {name: FIELDS[name](post) for name in names}
+
+
+def dumps(data):
+    return json.dumps(
+        data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def etag(content):
+    return '"{}"'.format(hashlib.md5(content).hexdigest())
+
+
+def page(paginator, request, names):
+    page_obj = paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return {
+        'next': paginator.next_cursor,
+        'previous': paginator.previous_cursor,
+        'results': [serialize(post, names) for post in page_obj],
+    }
+
+
+def respond(tag, body, cache_control):
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = tag
+    patch_cache_control(response, **cache_control)
+    return response
+
+
+def not_modified(request, tag, cache_control):
+    response = get_conditional_response(request, etag=tag)
+    if response is not None:
+        response['ETag'] = tag
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+def latest(model, field):
+    """Подзапрос: последнее значение поля-отметки по его индексу."""
+    return Subquery(model.objects.order_by(f'-{field}').values(field)[:1])
+
+
+def state(queryset, *markers, **subqueries):
+    """
+    Отметка ленты по базе: отметки владельца, последний изменённый пост
+    и значения подзапросов subqueries - одним запросом.
+    """
+    newest = queryset.order_by('-updated', '-pk').annotate(
+        **subqueries).values_list('updated', 'pk', *subqueries).first()
+    return '|'.join(str(value) for value in (*markers, newest))
+
+
+def public_feed(request, queryset, *markers, count=None, subqueries=None):
+    """Ответ публичной ленты; 304 отдаётся до чтения постов."""
+    try:
+        names, per_page = fields(request), limit(request)
+    except BadRequest as error:
+        return error_response(error)
+    tag = etag('{}|{}'.format(
+        state(queryset, *markers, **(subqueries or {})),
+        request.get_full_path()).encode())
+    cache_control = {'public': True, 'no_cache': True}
+    response = not_modified(request, tag, cache_control)
+    if response is not None:
+        return response
+    paginator = CursorPaginator(
+        queryset.select_related(*related(names)), per_page, count=count)
+    return respond(tag, dumps(page(paginator, request, names)), cache_control)
+
+
+def index(request):
+    # Названия групп и имена авторов: их правки меняют отметки.
+    return public_feed(request, Post.objects.all(), subqueries={
+        'groups': latest(Group, 'last_activity'),
+        'authors': latest(UserStats, 'last_activity'),
+    })
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return public_feed(
+        request, group.posts.all(), group.last_activity,
+        count=group.posts_count)
+
+
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    return public_feed(
+        request, author.posts.all(),
+        counters.user_stats(author).last_activity)
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error_response(
+            'Нужно войти в аккаунт.', status=HTTPStatus.UNAUTHORIZED)
+    try:
+        names, per_page = fields(request), limit(request)
+    except BadRequest as error:
+        return error_response(error)
+    body = dumps(page(feed_paginator(request.user, per_page), request, names))
+    tag = etag(body)
+    cache_control = {'private': True, 'no_cache': True}
+    response = not_modified(request, tag, cache_control)
+    if response is not None:
+        return response
+    return respond(tag, body, cache_control)
@@ -0,0 +1,123 @@
+"""
+Архив данных пользователя: ZIP с его постами, комментариями
+и подписками в JSON и исходными картинками постов.
+
+Архив собирается по ходу отдачи. zipfile пишет в буфер без seek
+(размер и CRC каждого файла уходят в дескриптор данных после
+содержимого), а генератор отдаёт накопленные байты после каждой строки
+и каждого куска картинки. Строки читаются через iterator(chunk_size),
+поэтому в памяти - одна порция строк, каким бы большим ни был аккаунт.
+"""
+import json
+import zipfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils import timezone
+
+from . import blobs
+from .models import Follow
+
+CHUNK_SIZE = 500
+FILE_CHUNK_SIZE = 64 * 1024
+IMAGES = 'images'
+
+
+class Buffer:
+    """Файл только для записи: zipfile пишет в него, генератор забирает."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def image_path(name):
+    return f'{IMAGES}/{name}' if name else None
+
+
+def _date(value):
+    return value.isoformat()
+
+
+def sections(user):
+    """Пары (имя JSON-файла, строки) в порядке записи в архив."""
+    posts = user.posts.order_by('pk').values_list(
+        'pk', 'text', 'pub_date', 'group__slug', 'image')
+    comments = user.comments.order_by('pk').values_list(
+        'pk', 'post_id', 'text', 'pub_date')
+    following = Follow.objects.filter(user=user).order_by('pk').values_list(
+        'author__username', flat=True)
+    followers = Follow.objects.filter(author=user).order_by(
+        'pk').values_list('user__username', flat=True)
+    yield 'posts', (
+        {'id': pk, 'text': text, 'pub_date': _date(pub_date),
+         'group': group, 'image': image_path(image)}
+        for pk, text, pub_date, group, image
+        in posts.iterator(chunk_size=CHUNK_SIZE))
+    yield 'comments', (
+        {'id': pk, 'post': post_id, 'text': text, 'pub_date': _date(pub_date)}
+        for pk, post_id, text, pub_date
+        in comments.iterator(chunk_size=CHUNK_SIZE))
+    yield 'following', following.iterator(chunk_size=CHUNK_SIZE)
+    yield 'followers', followers.iterator(chunk_size=CHUNK_SIZE)
+
+
+def image_names(user):
+    """Картинки постов без повторов: одна и та же может быть у многих."""
+    return user.posts.exclude(image='').order_by('image').values_list(
+        'image', flat=True).distinct().iterator(chunk_size=CHUNK_SIZE)
+
+
+def _entry(name, compress_type=zipfile.ZIP_DEFLATED):
+    info = zipfile.ZipInfo(name, timezone.localtime().timetuple()[:6])
+    info.compress_type = compress_type
+    return info
+
+
+def stream(user):
+    """Генератор байтов ZIP-архива пользователя, без пустых кусков."""
+    return filter(None, _stream(user))
+
+
+def _stream(user):
+    buffer = Buffer()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, rows in sections(user):
+            with archive.open(
+                    _entry(f'{name}.json'), 'w', force_zip64=True) as entry:
+                separator = b'[\n'
+                for row in rows:
+                    entry.write(separator + json.dumps(
+                        row, ensure_ascii=False).encode())
+                    separator = b',\n'
+                    yield buffer.take()
+                entry.write(b'[]\n' if separator == b'[\n' else b'\n]\n')
+            yield buffer.take()
+        storage = blobs.storage()
+        for name in image_names(user):
+            try:
+                file = storage.open(name)
+            except (SuspiciousFileOperation, OSError):
+                continue
+            # Картинки уже сжаты: deflate только тратил бы время.
+            with file, archive.open(
+                    _entry(image_path(name), zipfile.ZIP_STORED), 'w',
+                    force_zip64=True) as entry:
+                for chunk in file.chunks(FILE_CHUNK_SIZE):
+                    entry.write(chunk)
+                    yield buffer.take()
+    yield buffer.take()
+
+
+def filename(user):
+    return f'yatube-{user.username}.zip'
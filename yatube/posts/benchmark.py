@@ -0,0 +1,248 @@
+"""
+Нагрузочный замер страниц приложения posts.
+
+seed() наполняет базу правдоподобными объёмами: авторы и подписки
+распределены по степенному закону (немногие авторы собирают
+большинство подписчиков), у части постов - тысячи комментариев.
+Посты разнесены по времени на DATE_SPAN, как на живом сайте.
+run() запрашивает каждый адрес из posts/urls.py, кроме меняющих данные
+(MUTATING), анонимом и авторизованным читателем и считает перцентили
+времени ответа, число SQL-запросов и размер ответа.
+"""
+import math
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from . import counters, timeline
+from .models import Comment, Follow, Group, Post, TimelineEntry
+from .transfer import keep_dates
+from .urls import app_name, urlpatterns
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+USERNAME_PREFIX = 'bench_'
+WORDS = (
+    'лента', 'подписка', 'автор', 'группа', 'пост', 'комментарий',
+    'картинка', 'новость', 'заметка', 'вечер', 'город', 'дорога',
+)
+# За какой срок опубликованы посты seed().
+DATE_SPAN = timedelta(days=365)
+# Адреса, которые меняют данные даже на GET: замер сдвинул бы подписки
+# читателя для следующих строк и следующих запусков с --keepdb.
+MUTATING = ('profile_follow', 'profile_unfollow')
+
+
+def _insert(model, objects):
+    """Вставляет объекты пачками, не держа в памяти весь генератор."""
+    while True:
+        batch = list(islice(objects, BATCH_SIZE))
+        if not batch:
+            return
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def zipf_weights(number, alpha):
+    """Веса рангов 1..number, убывающие как 1 / rank ** alpha."""
+    return [1 / rank ** alpha for rank in range(1, number + 1)]
+
+
+def seed(users=5000, authors=1000, posts=100000, groups=50, follows=10,
+         comments=50000, hot_posts=20, hot_comments=1000, alpha=1.1,
+         random_seed=0):
+    """
+    Наполняет пустую базу.
+
+    authors первых пользователей пишут посты; и посты, и подписки
+    распределяются между ними по закону Ципфа с показателем alpha.
+    hot_posts постов получают по hot_comments комментариев, ещё comments
+    комментариев разбросаны по случайным постам. Посты выходят равномерно
+    за DATE_SPAN, комментарии - между постом и текущим моментом.
+    """
+    rng = random.Random(random_seed)
+    password = make_password(None)
+    now = timezone.now()
+    start = now - DATE_SPAN
+    step = DATE_SPAN / max(posts, 1)
+    with transaction.atomic(), keep_dates():
+        _insert(User, (
+            User(username=f'{USERNAME_PREFIX}{index}', password=password)
+            for index in range(users)))
+        user_ids = list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX,
+        ).order_by('pk').values_list('pk', flat=True))
+        author_ids = user_ids[:authors]
+        weights = zipf_weights(len(author_ids), alpha)
+
+        _insert(Group, (
+            Group(title=f'Группа {index}', slug=f'bench-{index}',
+                  description=_text(rng, 12))
+            for index in range(groups)))
+        group_ids = list(Group.objects.filter(
+            slug__startswith='bench-').values_list('pk', flat=True))
+
+        _insert(Post, (
+            Post(author_id=author_id, text=_text(rng, rng.randint(5, 60)),
+                 group_id=rng.choice(group_ids) if rng.random() < 0.7
+                 else None,
+                 pub_date=start + step * (index + rng.random()))
+            for index, author_id in enumerate(
+                rng.choices(author_ids, weights, k=posts))))
+        post_dates = dict(Post.objects.values_list('pk', 'pub_date'))
+        post_ids = list(post_dates)
+
+        _insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in set(rng.choices(author_ids, weights, k=follows))
+            if author_id != user_id))
+
+        commented = [
+            post_id for post_id in rng.sample(post_ids, hot_posts)
+            for _ in range(hot_comments)
+        ] + rng.choices(post_ids, k=comments)
+        _insert(Comment, (
+            Comment(post_id=post_id, author_id=rng.choice(user_ids),
+                    text=_text(rng, rng.randint(3, 30)),
+                    pub_date=post_dates[post_id] + (
+                        now - post_dates[post_id]) * rng.random())
+            for post_id in commented))
+
+        counters.recount()
+        timeline.rebuild()
+
+
+def samples():
+    """
+    Аргументы для адресов, query string и читатель для авторизованных
+    запросов: самые тяжёлые группа, автор, пост и лента; поиск - по
+    слову из самого обсуждаемого поста.
+    """
+    reader = User.objects.filter(stats__posts_count__gt=0).order_by(
+        '-stats__following_count', 'pk').first()
+    author = User.objects.exclude(pk=reader.pk).order_by(
+        '-stats__followers_count', 'pk').first()
+    group = Group.objects.order_by('-posts_count', 'pk').first()
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    own_post = reader.posts.order_by('-pub_date', '-pk').first()
+    kwargs = {
+        'slug': group.slug,
+        'username': author.username,
+        'post_id': post.pk,
+    }
+    overrides = {'post_edit': {'post_id': own_post.pk}}
+    queries = {'search': {'q': post.text.split()[0]}}
+    return reader, kwargs, overrides, queries
+
+
+def targets(kwargs, overrides, queries=None):
+    """Пары (имя, путь) для адресов из posts/urls.py, кроме MUTATING."""
+    queries = queries or {}
+    for pattern in urlpatterns:
+        if pattern.name in MUTATING:
+            continue
+        converters = pattern.pattern.converters
+        url_kwargs = overrides.get(pattern.name) or {
+            name: kwargs[name] for name in converters}
+        path = reverse(f'{app_name}:{pattern.name}', kwargs=url_kwargs)
+        if pattern.name in queries:
+            path = f'{path}?{urlencode(queries[pattern.name])}'
+        yield pattern.name, path
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def body_size(response):
+    """Размер тела; потоковый ответ (архив) собирается только при чтении."""
+    if response.streaming:
+        return sum(map(len, response.streaming_content))
+    return len(response.content)
+
+
+def measure(client, path, requests, warmup, cold):
+    for _ in range(warmup):
+        client.get(path)
+    timings, queries, sizes, hits = [], [], [], 0
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(path)
+            size = body_size(response)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        sizes.append(size)
+        hits += response.get('X-Page-Cache') == 'HIT'
+    return {
+        'status': response.status_code,
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': max(queries),
+        'bytes': max(sizes),
+        'page_cache_hits': hits,
+    }
+
+
+def run(requests=50, warmup=5, cold=False):
+    """
+    Замеры по всем адресам: список словарей с полями name, path, user
+    и результатами measure(). cold=True очищает кэш перед каждым
+    запросом.
+    """
+    reader, kwargs, overrides, queries = samples()
+    clients = {
+        'anonymous': Client(HTTP_HOST='localhost'),
+        'authenticated': Client(HTTP_HOST='localhost'),
+    }
+    clients['authenticated'].force_login(reader)
+    cache.clear()
+    results = []
+    for name, path in targets(kwargs, overrides, queries):
+        for user, client in clients.items():
+            results.append({
+                'name': name,
+                'path': path,
+                'user': user,
+                **measure(client, path, requests, warmup, cold),
+            })
+    return results
+
+
+def totals():
+    """Объёмы данных в базе, на которой идёт замер."""
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'follows': Follow.objects.count(),
+        'comments': Comment.objects.count(),
+        'timeline_entries': TimelineEntry.objects.count(),
+        'max_comments': Post.objects.aggregate(
+            value=Max('comments_count'))['value'],
+    }
@@ -0,0 +1,92 @@
+"""
+Учёт ссылок на файлы картинок постов.
+
+Ссылки считаются по самой таблице постов (Post.image с индексом):
+файл с именем по содержимому (posts.storage) может показываться
+в нескольких постах. Когда пост удалён или сменил картинку, release
+удаляет файл вместе с миниатюрами, если ссылок на него не осталось.
+
+Подсчёт ссылок не видит пост, который загрузил тот же файл, но ещё
+не зафиксирован. Такая загрузка только что переписала файл (storage
+пишет его при каждом сохранении), поэтому release не трогает файлы
+моложе settings.MEDIA_RELEASE_GRACE: их подберёт команда sweep_media.
+Перед удалением файл переименовывается, и его возраст проверяется
+ещё раз - загрузка между проверкой и удалением тоже не теряется.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def references(name):
+    """Сколько постов показывают файл."""
+    return Post.objects.filter(image=name).count()
+
+
+RELEASED_SUFFIX = '.released'
+
+
+def _fresh(path, grace):
+    return time.time() - os.path.getmtime(path) < grace
+
+
+def release(name, grace=None):
+    """
+    Удаляет файл, на который больше не ссылается ни один пост, вместе
+    с миниатюрами. Возвращает True, если файл удалён. grace - сколько
+    секунд не трогать свежезаписанный файл (по умолчанию из настроек).
+    """
+    if grace is None:
+        grace = settings.MEDIA_RELEASE_GRACE
+    if not name or references(name):
+        return False
+    try:
+        path = storage().path(name)
+        if _fresh(path, grace):
+            return False
+        released = path + RELEASED_SUFFIX
+        os.rename(path, released)
+    except (SuspiciousFileOperation, OSError):
+        # Файла нет или имя вне MEDIA_ROOT: хранилищу он не принадлежит.
+        return False
+    if _fresh(released, grace):
+        # Загрузка переписала файл до переименования: возвращаем его.
+        # Содержимое по имени одно, так что замена ничего не портит.
+        os.replace(released, path)
+        return False
+    os.remove(released)
+    default.kvstore.delete(ImageFile(name, storage()))
+    return True
+
+
+def unreferenced():
+    """Файлы с именами по содержимому, на которые нет ни одной ссылки."""
+    storage_ = storage()
+    root = storage_.path(Post._meta.get_field('image').upload_to)
+    for directory, _, files in os.walk(root):
+        names = [
+            os.path.relpath(os.path.join(directory, file), storage_.location)
+            for file in files
+        ]
+        names = [name for name in names
+                 if storage_.is_content_addressed(name)]
+        known = set(Post.objects.filter(image__in=names).values_list(
+            'image', flat=True))
+        yield from (name for name in names if name not in known)
+
+
+def schedule_release(name):
+    """Освобождает файл после фиксации транзакции, удалившей ссылку."""
+    if name:
+        transaction.on_commit(lambda: release(name))
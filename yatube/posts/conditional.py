@@ -0,0 +1,66 @@
+"""
+Условные GET для страниц поста, группы и автора.
+
+View сначала читает одну строку с отметками изменений (Post.updated,
+Group.last_activity, UserStats.last_activity) и вызывает check(): если
+ETag или дата клиента совпадают, ответ 304 уходит до запросов постов
+и комментариев и без рендера. Декоратор page добавляет ETag
+и Last-Modified к обычному ответу.
+
+В ETag входят пользователь и адрес с query string: страница у каждого
+своя (шапка, кнопки подписки и правки), а курсоры дают разные страницы
+одной ленты.
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def validators(request, *markers):
+    """(ETag, Last-Modified в секундах) по отметкам изменений."""
+    markers = [marker for marker in markers if marker is not None]
+    if not markers:
+        return None
+    last_modified = max(markers)
+    key = '|'.join([
+        *(marker.isoformat() for marker in markers),
+        str(request.user.pk if request.user.is_authenticated else ''),
+        request.get_full_path(),
+    ])
+    tag = '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+    return tag, timegm(last_modified.utctimetuple())
+
+
+def check(request, *markers):
+    """Ответ 304, если у клиента актуальная версия страницы, иначе None."""
+    request.conditional_validators = validators(request, *markers)
+    if request.conditional_validators is None:
+        return None
+    tag, last_modified = request.conditional_validators
+    response = get_conditional_response(
+        request, etag=tag, last_modified=last_modified)
+    if response is not None:
+        _set(response, tag, last_modified)
+    return response
+
+
+def _set(response, tag, last_modified):
+    response['ETag'] = tag
+    response['Last-Modified'] = http_date(last_modified)
+    # Версия анонима не должна подойти вошедшему пользователю.
+    patch_vary_headers(response, ('Cookie',))
+
+
+def page(view):
+    """Добавляет к ответу view валидаторы, посчитанные в check()."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        found = getattr(request, 'conditional_validators', None)
+        if found is not None and response.status_code == 200:
+            _set(response, *found)
+        return response
+    return wrapper
@@ -0,0 +1,64 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _add(queryset, field, delta):
+    """Атомарно сдвигает счётчик на delta; вернёт число изменённых строк."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def add_user_stat(user_id, field, delta):
+    if _add(UserStats.objects.filter(user_id=user_id), field, delta):
+        return
+    if delta > 0:
+        # Строки ещё нет: заводим её с нулями и повторяем сдвиг.
+        UserStats.objects.get_or_create(user_id=user_id)
+        _add(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def user_stats(user):
+    """Счётчики пользователя; строку заводит, если её ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats, _ = UserStats.objects.get_or_create(user=user)
+        return user.stats
+
+
+def add_group_posts(group_id, delta):
+    if group_id is not None:
+        _add(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def add_post_comments(post_id, delta):
+    _add(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(queryset, key):
+    """Подзапрос COUNT(*) по строкам queryset, где key = OuterRef('pk')."""
+    return Coalesce(Subquery(
+        queryset.filter(**{key: OuterRef('pk')}).order_by().values(key)
+        .annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def recount():
+    """Пересчитывает все счётчики по данным таблиц."""
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    Group.objects.update(posts_count=_count(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
+    UserStats.objects.update(
+        posts_count=_count(Post.objects, 'author'),
+        followers_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
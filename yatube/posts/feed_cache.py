@@ -0,0 +1,79 @@
+"""
+Поколения кэша фрагментов лент.
+
+У каждой ленты (главная, группа, автор) есть номер поколения в кэше.
+Он входит в ключ {% cache %}, поэтому при изменении постов достаточно
+сдвинуть поколение - старые фрагменты просто перестают читаться
+и вытесняются по TTL.
+
+Имена авторов и групп видны не только в их лентах: автор - в группах
+и под комментариями, группа - в профилях и на странице поста. Поэтому
+каждая страница с чужими именами зависит и от общей ленты NAMES,
+которую сдвигает переименование.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+INDEX = 'index'
+NAMES = 'names'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _key(scope):
+    return f'feed:generation:{scope}'
+
+
+def _initial():
+    # Поколение, потерянное при вытеснении, не должно начаться заново
+    # с уже использованного номера.
+    return time.time_ns() // 1000
+
+
+def version(*scopes):
+    """Текущая версия фрагмента, зависящего от перечисленных лент."""
+    keys = [_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial(), None)
+            generations[key] = cache.get(key)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Сдвигает поколения лент: их закэшированные фрагменты устаревают."""
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _initial(), None)
+
+
+def context(*scopes):
+    """Переменные шаблона для {% cache cache_timeout ... cache_version %}."""
+    return {
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'cache_version': version(*scopes),
+    }
+
+
+def invalidate_post(post, previous_group_id=None):
+    """Устаревают пост и все ленты, в которых он показывается."""
+    scopes = {INDEX, author_scope(post.author_id), post_scope(post.pk)}
+    for group_id in (post.group_id, previous_group_id):
+        if group_id is not None:
+            scopes.add(group_scope(group_id))
+    bump(*scopes)
@@ -0,0 +1,152 @@
+"""
+RSS и Atom лент: главная, группа и автор.
+
+В ленте не больше FEED_ENTRIES последних постов. Готовый XML хранит
+кэш страниц (page_cache) вместе с поколениями своей ленты и имён
+(feed_cache.NAMES): в пунктах видны авторы и группы, поэтому ленту
+собирают заново и сохранение поста, и любое переименование. Пока
+поколения те же, опрос отвечается из кэша без SQL, а с If-None-Match
+или If-Modified-Since - пустым 304.
+"""
+import hashlib
+
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import parse_http_date_safe
+from django.utils.text import Truncator
+
+from . import feed_cache, page_cache
+from .models import Group, Post, User
+
+FEED_ENTRIES = 20
+TITLE_WORDS = 10
+
+
+class PostsFeed(Feed):
+    """Общая часть лент: пункты - посты от новых к старым."""
+
+    def get_object(self, request, *args, **kwargs):
+        obj = self.get_scope_object(*args, **kwargs)
+        page_cache.tag(request, self.scope(obj), feed_cache.NAMES)
+        return obj
+
+    def get_scope_object(self):
+        return None
+
+    def scope(self, obj):
+        return feed_cache.INDEX
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).select_related('author', 'group').order_by(
+            '-pub_date', '-pk')[:FEED_ENTRIES]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(TITLE_WORDS)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group_id else ()
+
+    def __call__(self, request, *args, **kwargs):
+        response = super().__call__(request, *args, **kwargs)
+        response['ETag'] = '"{}"'.format(
+            hashlib.md5(response.content).hexdigest())
+        return get_conditional_response(
+            request, etag=response['ETag'],
+            last_modified=parse_http_date_safe(response['Last-Modified']),
+            response=response)
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов.'
+
+    def link(self):
+        return reverse('posts:index')
+
+
+class GroupFeed(PostsFeed):
+    def get_scope_object(self, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def scope(self, group):
+        return feed_cache.group_scope(group.pk)
+
+    def posts(self, group):
+        return group.posts.all()
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', kwargs={'slug': group.slug})
+
+
+class AuthorFeed(PostsFeed):
+    def get_scope_object(self, username):
+        return get_object_or_404(User, username=username)
+
+    def scope(self, author):
+        return feed_cache.author_scope(author.pk)
+
+    def posts(self, author):
+        return author.posts.all()
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}.'
+
+    def link(self, author):
+        return reverse('posts:profile', kwargs={'username': author.username})
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+
+class IndexAtomFeed(AtomMixin, IndexFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AuthorAtomFeed(AtomMixin, AuthorFeed):
+    pass
+
+
+index_rss = page_cache.cache_anonymous_page(IndexFeed())
+index_atom = page_cache.cache_anonymous_page(IndexAtomFeed())
+group_rss = page_cache.cache_anonymous_page(GroupFeed())
+group_atom = page_cache.cache_anonymous_page(GroupAtomFeed())
+profile_rss = page_cache.cache_anonymous_page(AuthorFeed())
+profile_atom = page_cache.cache_anonymous_page(AuthorAtomFeed())
@@ -0,0 +1,65 @@
+"""
+Граф подписок в кэше.
+
+Для каждого пользователя кэш хранит id авторов, на которых он подписан,
+отсортированным массивом int64 (8 байт на подписку). "Подписан ли A
+на B" и "на кого подписан A" решаются двоичным поиском по массиву без
+запросов к базе; база читается один раз при промахе кэша.
+
+Сигналы Follow удаляют массив подписчика из кэша, а не правят его:
+следующее чтение соберёт массив из базы. Удаление повторяется после
+фиксации транзакции - чтение между записью и фиксацией могло вернуть
+в кэш массив без новой подписки. Откаченная подписка оставляет только
+лишний промах.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+TYPECODE = 'q'
+
+
+def _key(user_id):
+    return f'follow:following:{user_id}'
+
+
+def _load(data):
+    ids = array(TYPECODE)
+    ids.frombytes(data)
+    return ids
+
+
+def _store(user_id, ids):
+    cache.set(_key(user_id), ids.tobytes(), settings.FOLLOW_GRAPH_TIMEOUT)
+
+
+def following(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id."""
+    data = cache.get(_key(user_id))
+    if data is not None:
+        return _load(data)
+    ids = array(TYPECODE, Follow.objects.filter(user_id=user_id).order_by(
+        'author_id').values_list('author_id', flat=True))
+    _store(user_id, ids)
+    return ids
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user_id, author_id):
+    return _contains(following(user_id), author_id)
+
+
+def invalidate(user_id):
+    """Сбрасывает массив подписок user_id сейчас и после фиксации."""
+    key = _key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
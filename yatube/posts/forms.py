@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Comment, Post
+from . import images, thumbnails
+from .models import Comment, Group, Post, User
 
 
 class PostForm(forms.ModelForm):
@@ -8,8 +10,38 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return images.ingest(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and post.image and 'image' in self.changed_data:
+            thumbnails.schedule(post.image.name)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Что искать', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(), label='Группа', to_field_name='slug',
+        required=False, empty_label='Все группы',
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise forms.ValidationError('Такого автора нет.')
+        return author
@@ -0,0 +1,55 @@
+"""
+Приём загруженных картинок постов.
+
+Перед сохранением картинка поворачивается по EXIF, ужимается до
+settings.IMAGE_MAX_SIZE по большей стороне и пересохраняется без
+метаданных (EXIF с геометкой, ICC, текстовые блоки PNG не копируются):
+непрозрачная - в прогрессивный JPEG, с прозрачностью - в WebP или,
+если Pillow собран без него, в PNG. Анимация пересохранением
+потерялась бы, поэтому анимированные картинки сохраняются как есть.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+WEBP = features.check('webp')
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def ingest(upload):
+    """
+    ContentFile с пересохранённой картинкой из загруженного файла;
+    расширение имени меняется под новый формат.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload
+    image = ImageOps.exif_transpose(image)
+    max_size = settings.IMAGE_MAX_SIZE
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    output = BytesIO()
+    if not has_alpha(image):
+        extension = 'jpg'
+        image.convert('RGB').save(
+            output, 'JPEG', quality=JPEG_QUALITY,
+            optimize=True, progressive=True)
+    elif WEBP:
+        extension = 'webp'
+        image.convert('RGBA').save(
+            output, 'WEBP', quality=WEBP_QUALITY, method=6)
+    else:
+        extension = 'png'
+        image.convert('RGBA').save(output, 'PNG', optimize=True)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(output.getvalue(), name=f'{name}.{extension}')
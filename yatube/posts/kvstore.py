@@ -0,0 +1,92 @@
+"""
+Хранилище ключей sorl-thumbnail в отдельном файле SQLite.
+
+Записи о миниатюрах переживают перезапуск процесса и общие для всех
+воркеров, в отличие от LocMemCache. Умеет читать много ключей одним
+запросом (get_many) - им пользуется thumbnails.prefetch.
+"""
+import os
+import sqlite3
+import threading
+from itertools import islice
+
+from django.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+# Не больше параметров в одном IN, чем позволяют старые сборки SQLite.
+BATCH_SIZE = 500
+TIMEOUT = 5
+
+
+class KVStore(KVStoreBase):
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def _connection(self, create=False):
+        """
+        Соединение текущего потока с файлом settings.THUMBNAIL_KVSTORE_FILE.
+        Для чтения файл не создаётся: пока его нет, ключей тоже нет.
+        """
+        path = settings.THUMBNAIL_KVSTORE_FILE
+        if not hasattr(self._local, 'connections'):
+            self._local.connections = {}
+        connection = self._local.connections.get(path)
+        if connection is None:
+            if not create and not os.path.exists(path):
+                return None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(
+                path, timeout=TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS kvstore '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self._local.connections[path] = connection
+        return connection
+
+    def _get_raw(self, key):
+        return self._get_many_raw([key]).get(key)
+
+    def _get_many_raw(self, keys):
+        connection = self._connection()
+        values = {}
+        if connection is None:
+            return values
+        keys = iter(keys)
+        while True:
+            batch = list(islice(keys, BATCH_SIZE))
+            if not batch:
+                return values
+            values.update(connection.execute(
+                'SELECT key, value FROM kvstore WHERE key IN ({})'.format(
+                    ', '.join('?' * len(batch))), batch))
+
+    def _set_raw(self, key, value):
+        self._connection(create=True).execute(
+            'INSERT OR REPLACE INTO kvstore (key, value) VALUES (?, ?)',
+            (key, value))
+
+    def _delete_raw(self, *keys):
+        connection = self._connection()
+        if connection is not None:
+            connection.executemany(
+                'DELETE FROM kvstore WHERE key = ?', ((key,) for key in keys))
+
+    def _find_keys_raw(self, prefix):
+        connection = self._connection()
+        if connection is None:
+            return []
+        return [key for key, in connection.execute(
+            'SELECT key FROM kvstore WHERE substr(key, 1, ?) = ?',
+            (len(prefix), prefix))]
+
+    def get_many(self, image_files):
+        """Записи для списка ImageFile одним запросом; None для ненайденных."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        values = self._get_many_raw(keys)
+        return [
+            deserialize_image_file(values[key]) if values.get(key) else None
+            for key in keys
+        ]
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import benchmark
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число SQL-запросов и размер страниц '
+        'posts на отдельной наполненной базе и пишет результаты в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument(
+            '--authors', type=int, default=1000,
+            help='Сколько пользователей пишут посты.')
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Подписок на пользователя (до удаления повторов).')
+        parser.add_argument(
+            '--comments', type=int, default=50000,
+            help='Комментарии, разбросанные по случайным постам.')
+        parser.add_argument('--hot-posts', type=int, default=20)
+        parser.add_argument(
+            '--hot-comments', type=int, default=1000,
+            help='Комментариев у каждого из --hot-posts постов.')
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного распределения авторов.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять базу замера и не наполнять её повторно.')
+        parser.add_argument('--output', default='benchmark.json')
+
+    def test_database_name(self):
+        if connection.vendor == 'sqlite':
+            return os.path.join(settings.BASE_DIR, 'benchmark.sqlite3')
+        return f'benchmark_{connection.settings_dict["NAME"]}'
+
+    def handle(self, *args, **options):
+        connection.settings_dict['TEST']['NAME'] = self.test_database_name()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, keepdb=options['keepdb'], serialize=False)
+        try:
+            if not Post.objects.exists():
+                started = time.perf_counter()
+                benchmark.seed(
+                    users=options['users'],
+                    authors=options['authors'],
+                    posts=options['posts'],
+                    groups=options['groups'],
+                    follows=options['follows'],
+                    comments=options['comments'],
+                    hot_posts=options['hot_posts'],
+                    hot_comments=options['hot_comments'],
+                    alpha=options['alpha'],
+                    random_seed=options['seed'],
+                )
+                self.stdout.write(
+                    f'База наполнена за {time.perf_counter() - started:.1f} с')
+            report = {
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'cold': options['cold'],
+                'data': benchmark.totals(),
+                'results': benchmark.run(
+                    options['requests'], options['warmup'], options['cold']),
+            }
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        for row in report['results']:
+            self.stdout.write(
+                '{name:<18} {user:<13} {status} p50={p50_ms:>8} '
+                'p95={p95_ms:>8} p99={p99_ms:>8} ms '
+                'sql={queries:<3} bytes={bytes}'.format(**row))
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
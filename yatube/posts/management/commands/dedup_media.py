@@ -0,0 +1,61 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import blobs, feed_cache
+from posts.models import Post
+from posts.storage import content_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит загруженные ранее картинки постов под имена по '
+        'содержимому: одинаковые файлы остаются в одном экземпляре.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        storage = blobs.storage()
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct()
+        seen = set()
+        moved = duplicates = freed = 0
+        for name in names.iterator():
+            if storage.is_content_addressed(name):
+                continue
+            try:
+                if not storage.exists(name):
+                    continue
+            except (SuspiciousFileOperation, OSError):
+                continue
+            with storage.open(name) as content:
+                target = content_name(name, content)
+                size = content.size
+                duplicate = target in seen or storage.exists(target)
+                if not options['dry_run'] and not duplicate:
+                    storage.save(name, content)
+            seen.add(target)
+            if duplicate:
+                duplicates += 1
+                freed += size
+            else:
+                moved += 1
+            if options['dry_run']:
+                continue
+            with transaction.atomic():
+                posts = list(Post.objects.filter(image=name))
+                Post.objects.filter(image=name).update(
+                    image=target, updated=timezone.now())
+            for post in posts:
+                feed_cache.invalidate_post(post)
+            # Старое имя ни одна новая загрузка уже не получит.
+            blobs.release(name, grace=0)
+        self.stdout.write(
+            f'Перенесено файлов: {moved}, дубликатов: {duplicates}, '
+            f'освобождено байт: {freed}.')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в каталог: '
+        'по файлу JSONL или CSV на модель.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default=transfer.JSONL)
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.')
+
+    def report(self, progress):
+        self.stdout.write(
+            f'{progress.name}: {progress.rows} строк, '
+            f'{progress.rate:.0f} строк/с')
+
+    def handle(self, *args, **options):
+        transfer.export(
+            options['directory'], options['format'],
+            options['chunk_size'], self.report)
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.timeline import follower_counts, refresh_pull_authors
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает и показывает, какие авторы раскладывают посты '
+        'по лентам подписчиков (push), а какие подмешиваются в ленту '
+        'при чтении (pull). Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--push', action='store_true',
+            help='Вывести поимённо и авторов на раскладке.',
+        )
+
+    def handle(self, *args, **options):
+        counts = follower_counts()
+        pull = refresh_pull_authors()
+        push = [author_id for author_id in counts if author_id not in pull]
+        # Имена только тех, кого печатаем: и pull, и push взяты из счётчиков.
+        printed = set(pull) | (set(push) if options['push'] else set())
+        names = dict(User.objects.filter(pk__in=printed).values_list(
+            'pk', 'username'))
+        self.stdout.write(
+            f'Порог подписчиков: {settings.FEED_PULL_THRESHOLD}')
+        self.stdout.write(f'pull: {len(pull)}')
+        for author_id in sorted(pull, key=counts.get, reverse=True):
+            self.stdout.write(f'  {names[author_id]}\t{counts[author_id]}')
+        self.stdout.write(f'push: {len(push)}')
+        if options['push']:
+            for author_id in sorted(push, key=counts.get, reverse=True):
+                self.stdout.write(
+                    f'  {names[author_id]}\t{counts[author_id]}')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из каталога, '
+        'выгруженного export_posts. Уже существующие строки пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default=transfer.JSONL)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк вставлять одним запросом.')
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать недостающих пользователей без пароля.')
+
+    def report(self, progress):
+        self.stdout.write(
+            f'{progress.name}: {progress.rows} строк, '
+            f'пропущено {progress.skipped}, {progress.rate:.0f} строк/с')
+
+    def handle(self, *args, **options):
+        importer = transfer.Importer(
+            options['batch_size'], options['create_users'], self.report)
+        importer.run(options['directory'], options['format'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, комментариев '
+        'и подписок по данным таблиц.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount()
+        self.stdout.write('Счётчики пересчитаны.')
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок постов, на которые не осталось ссылок: '
+        'и те, что release пропустил как слишком свежие.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_RELEASE_GRACE,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+
+    def handle(self, *args, **options):
+        removed = sum(
+            blobs.release(name, grace=options['grace'])
+            for name in blobs.unreferenced()
+        )
+        self.stdout.write(f'Удалено файлов: {removed}.')
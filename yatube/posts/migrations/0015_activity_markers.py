@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:51
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def fill_updated(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_activity',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последнее изменение'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+    ]
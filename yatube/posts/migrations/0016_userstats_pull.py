@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_pull(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.FEED_PULL_THRESHOLD).update(pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_activity_markers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pull',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Посты подмешиваются при чтении'),
+        ),
+        migrations.RunPython(fill_pull, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_userstats_pull'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='group',
+            name='last_activity',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Последнее изменение'),
+        ),
+        migrations.AlterField(
+            model_name='userstats',
+            name='last_activity',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated'], name='post_updated_idx'),
+        ),
+    ]
@@ -1,11 +1,15 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 from core.models import CreatedModel
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 NUM_OF_CHAR = 15
+LOADED_FIELDS = ('group_id', 'image')
 
 
 class Group(models.Model):
@@ -20,6 +24,16 @@ class Group(models.Model):
     description = models.TextField(
         'Описание'
     )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False,
+    )
+    last_activity = models.DateTimeField(
+        'Последнее изменение',
+        auto_now=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -53,13 +67,47 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True,
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
     )
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('updated',),
+                name='post_updated_idx',
+            ),
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Группа и картинка из базы: сигналам сохранения нужны прежние.
+        post._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in LOADED_FIELDS}
+        return post
 
     def __str__(self) -> str:
         return self.text[:NUM_OF_CHAR]
@@ -85,6 +133,12 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('post', 'pub_date'),
+                name='comment_post_pub_date_idx',
+            ),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -111,8 +165,90 @@ class Follow(models.Model):
             fields=('user', 'author',),
             name='unique_follower'
         ),)
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx',
+            ),
+        )
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые иначе считались бы COUNT(*)."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0, db_index=True)
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0)
+    last_activity = models.DateTimeField(
+        'Последнее изменение', default=timezone.now, db_index=True)
+    pull = models.BooleanField(
+        'Посты подмешиваются при чтении', default=False, db_index=True)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Запись входящей ленты подписчика.
+
+    Копия (pub_date, post_id) поста лежит рядом с user_id, чтобы лента
+    подписок читалась одним диапазоном по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = (models.UniqueConstraint(
+            fields=('user', 'post',),
+            name='unique_timeline_entry'
+        ),)
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
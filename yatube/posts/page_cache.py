@@ -0,0 +1,105 @@
+"""
+Кэш целых страниц для анонимных посетителей.
+
+Страница хранится по пути с query string вместе с версиями лент
+(feed_cache), от которых она зависит. Сигналы постов и комментариев
+сдвигают эти версии, и устаревшие страницы перестают отдаваться
+без перебора ключей кэша.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import feed_cache
+
+HITS_KEY = 'page_cache:hits'
+MISSES_KEY = 'page_cache:misses'
+
+
+def _key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page_cache:page:{path}'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    """Счётчики попаданий и промахов: {'hits': ..., 'misses': ...}."""
+    values = cache.get_many((HITS_KEY, MISSES_KEY))
+    return {
+        'hits': values.get(HITS_KEY, 0),
+        'misses': values.get(MISSES_KEY, 0),
+    }
+
+
+def tag(request, *scopes):
+    """
+    Отмечает, от каких лент зависит страница, которую строит view.
+
+    Версии запоминаются сразу, до тяжёлых запросов: если лента изменится
+    во время рендера, сохранённая страница уже не совпадёт по версии.
+    """
+    request.page_cache_scopes = getattr(
+        request, 'page_cache_scopes', ()) + scopes
+    request.page_cache_versions = getattr(
+        request, 'page_cache_versions', ()) + (feed_cache.version(*scopes),)
+
+
+def _cacheable(request):
+    return (request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated)
+
+
+def _conditional(request, response):
+    """304 вместо сохранённой страницы, если она у клиента уже есть."""
+    if 'ETag' not in response and 'Last-Modified' not in response:
+        return response
+    return get_conditional_response(
+        request, etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(
+            response.get('Last-Modified', '')),
+        response=response)
+
+
+def cache_anonymous_page(view):
+    """Отдаёт анонимам закэшированную страницу, пока её ленты не менялись."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view(request, *args, **kwargs)
+        key = _key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            scopes, version, status, headers, content = entry
+            if feed_cache.version(*scopes) == version:
+                _count(HITS_KEY)
+                response = HttpResponse(content, status=status)
+                for header, value in headers:
+                    response[header] = value
+                response = _conditional(request, response)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+        _count(MISSES_KEY)
+        response = view(request, *args, **kwargs)
+        scopes = getattr(request, 'page_cache_scopes', ())
+        if (response.status_code == 200 and scopes
+                and not response.streaming and not response.cookies):
+            cache.set(key, (
+                scopes, '.'.join(request.page_cache_versions),
+                response.status_code,
+                list(response.items()), response.content,
+            ), settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
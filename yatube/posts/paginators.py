@@ -0,0 +1,162 @@
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+CURSOR_KEYS = ('pub_date', 'pk')
+
+
+def encode_cursor(obj):
+    """Непрозрачный токен позиции записи в ленте: (pub_date, id)."""
+    return urlsafe_base64_encode(
+        force_bytes(f'{obj.pub_date.isoformat()}|{obj.pk}'))
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) из токена или None, если токен битый."""
+    try:
+        raw = force_str(urlsafe_base64_decode(token))
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date, pk = parse_datetime(pub_date), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+def cursor_key(obj):
+    return obj.pub_date, obj.pk
+
+
+class CursorPaginator(Paginator):
+    """
+    Пагинатор по ключу (pub_date, id).
+
+    Страница по курсору выбирается одним запросом с LIMIT, без COUNT
+    и OFFSET, поэтому N-я страница стоит столько же, сколько первая.
+    Нумерованные страницы (?page=N) по-прежнему работают как у Paginator.
+
+    keys - имена полей пары (pub_date, id), если ключ хранится под другими
+    именами (например, post_id во входящей ленте); related - поле, через
+    которое строки запроса превращаются в объекты страницы; count - уже
+    известное число записей (денормализованный счётчик) вместо COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page, keys=CURSOR_KEYS,
+                 related=None, count=None, **kwargs):
+        self.date_key, self.pk_key = keys
+        self.related = related
+        self.known_count = count
+        super().__init__(
+            object_list.order_by(f'-{self.date_key}', f'-{self.pk_key}'),
+            per_page, **kwargs)
+        self.is_cursor = False
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def cursor_filter(self, cursor, lookup):
+        # (pub_date, id) < (d, pk) в виде, который SQLite превращает
+        # в диапазон по индексу: pub_date <= d AND (pub_date < d OR id < pk).
+        pub_date, pk = cursor
+        return Q(**{f'{self.date_key}__{lookup}e': pub_date}) & (
+            Q(**{f'{self.date_key}__{lookup}': pub_date})
+            | Q(**{f'{self.pk_key}__{lookup}': pk})
+        )
+
+    def resolve(self, rows):
+        if self.related is None:
+            return list(rows)
+        return [getattr(row, self.related) for row in rows]
+
+    def fetch(self, cursor, lookup, limit):
+        """
+        До limit объектов за курсором: lookup='lt' - старше курсора
+        от новых к старым, lookup='gt' - новее курсора от старых к новым.
+        """
+        queryset = self.object_list
+        if cursor is not None:
+            queryset = queryset.filter(self.cursor_filter(cursor, lookup))
+        if lookup == 'gt':
+            queryset = queryset.reverse()
+        return self.resolve(queryset[:limit])
+
+    def get_cursor_page(self, after=None, before=None):
+        """Страница записей старше курсора after или новее курсора before."""
+        self.is_cursor = True
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if before is not None:
+            rows = self.fetch(before, 'gt', self.per_page + 1)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            rows = self.fetch(after, 'lt', self.per_page + 1)
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = after is not None
+        if rows:
+            if has_next:
+                self.next_cursor = encode_cursor(rows[-1])
+            if has_previous:
+                self.previous_cursor = encode_cursor(rows[0])
+        number = 2 if self.previous_cursor else 1
+        self._cursor_num_pages = number + 1 if self.next_cursor else number
+        return Page(rows, number, self)
+
+    def _get_page(self, object_list, number, paginator):
+        return Page(self.resolve(object_list), number, paginator)
+
+    @cached_property
+    def count(self):
+        if self.is_cursor:
+            return None
+        if self.known_count is not None:
+            return self.known_count
+        return super().count
+
+    @cached_property
+    def num_pages(self):
+        if self.is_cursor:
+            return self._cursor_num_pages
+        return super().num_pages
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Курсорная лента, собранная из нескольких непересекающихся источников.
+
+    Каждый источник - CursorPaginator; на страницу из каждого читается
+    не больше per_page + 1 строк, после чего они сливаются по (pub_date, id).
+    """
+
+    def __init__(self, paginators, per_page, **kwargs):
+        Paginator.__init__(self, paginators, per_page, **kwargs)
+        self.paginators = paginators
+        self.is_cursor = False
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def fetch(self, cursor, lookup, limit):
+        rows = sorted(
+            (row for paginator in self.paginators
+             for row in paginator.fetch(cursor, lookup, limit)),
+            key=cursor_key,
+            reverse=lookup == 'lt',
+        )
+        return rows[:limit]
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = self.fetch(None, 'lt', bottom + self.per_page)
+        return Page(rows[bottom:], number, self)
+
+    @cached_property
+    def count(self):
+        if self.is_cursor:
+            return None
+        return sum(paginator.count for paginator in self.paginators)
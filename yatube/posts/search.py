@@ -0,0 +1,228 @@
+"""
+Полнотекстовый поиск по постам.
+
+В SQLite индекс - виртуальная таблица FTS5 posts_post_fts с внешним
+содержимым posts_post. Триггеры на вставку, изменение текста и удаление
+поста обновляют индекс в той же транзакции, так что он не отстаёт и
+при bulk_create или update(). Найденное ранжируется по bm25, сниппеты
+с подсвеченными словами строит snippet(). На других СУБД поиск
+идёт по icontains от новых постов к старым, без ранжирования.
+
+SQLite теряет триггеры, когда миграция пересоздаёт таблицу постов,
+поэтому после каждого migrate (post_migrate) repair возвращает
+триггеры и перестраивает индекс.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+
+
+def normalized(column):
+    """
+    Текст для индекса: ё читается как е. Токены и их позиции при этом
+    не меняются, поэтому snippet() по исходному тексту совпадает
+    с индексом.
+    """
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+CREATE_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+TRIGGERS = {
+    f'{TABLE}_insert': (
+        f'CREATE TRIGGER IF NOT EXISTS {TABLE}_insert '
+        'AFTER INSERT ON posts_post BEGIN '
+        f'INSERT INTO {TABLE} (rowid, text) '
+        f"VALUES (new.id, {normalized('new.text')}); "
+        'END'
+    ),
+    f'{TABLE}_delete': (
+        f'CREATE TRIGGER IF NOT EXISTS {TABLE}_delete '
+        'AFTER DELETE ON posts_post BEGIN '
+        f'INSERT INTO {TABLE} ({TABLE}, rowid, text) '
+        f"VALUES ('delete', old.id, {normalized('old.text')}); "
+        'END'
+    ),
+    f'{TABLE}_update': (
+        f'CREATE TRIGGER IF NOT EXISTS {TABLE}_update '
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        f'INSERT INTO {TABLE} ({TABLE}, rowid, text) '
+        f"VALUES ('delete', old.id, {normalized('old.text')}); "
+        f'INSERT INTO {TABLE} (rowid, text) '
+        f"VALUES (new.id, {normalized('new.text')}); "
+        'END'
+    ),
+}
+
+MAX_TERMS = 8
+SNIPPET_TOKENS = 24
+# Маркеры подсветки, которых нет в тексте постов: сниппет сначала
+# экранируется, и только потом они заменяются на <mark>.
+MARK_START = '\x02'
+MARK_END = '\x03'
+ELLIPSIS = '…'
+WORD = re.compile(r'\w+')
+
+
+def enabled(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def _existing(cursor):
+    names = [TABLE, *TRIGGERS]
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') "
+        'AND name IN ({})'.format(', '.join(['%s'] * len(names))), names)
+    return {name for name, in cursor.fetchall()}
+
+
+def install(using=None):
+    """Создаёт индекс с триггерами и заполняет его."""
+    using = using or connection
+    if not enabled(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+        # Не 'rebuild': он проиндексировал бы текст без замены ё.
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) '
+            f"SELECT id, {normalized('text')} FROM posts_post")
+
+
+def repair(using=None):
+    """Возвращает потерянные триггеры созданного индекса."""
+    using = using or connection
+    if not enabled(using):
+        return
+    with using.cursor() as cursor:
+        existing = _existing(cursor)
+    if TABLE in existing and len(existing) < len(TRIGGERS) + 1:
+        install(using)
+
+
+def uninstall(using=None):
+    using = using or connection
+    if not enabled(using):
+        return
+    with using.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+def terms(query):
+    """Слова запроса в нижнем регистре и с е вместо ё, до MAX_TERMS."""
+    return WORD.findall(query.lower().replace('ё', 'е'))[:MAX_TERMS]
+
+
+def match_expression(words):
+    """Запрос FTS5: все слова, каждое как префикс."""
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(words):
+    """Подзапрос с id постов, в которых есть все слова (для pk__in)."""
+    return RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        (match_expression(words),))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>'))
+
+
+class SearchResults:
+    """
+    Найденные посты для Paginator: count() и срез - по одному запросу
+    к индексу. Посты среза приходят с author и group и с готовым
+    сниппетом в post.snippet.
+    """
+
+    def __init__(self, query, group=None, author=None):
+        self.words = terms(query)
+        self.group = group
+        self.author = author
+        self._count = None
+
+    def _filters(self):
+        sql, params = [], []
+        if self.group is not None:
+            sql.append('AND p.group_id = %s')
+            params.append(self.group.pk)
+        if self.author is not None:
+            sql.append('AND p.author_id = %s')
+            params.append(self.author.pk)
+        return ' '.join(sql), params
+
+    def _queryset(self):
+        queryset = Post.objects.all()
+        for word in self.words:
+            queryset = queryset.filter(text__icontains=word)
+        if self.group is not None:
+            queryset = queryset.filter(group=self.group)
+        if self.author is not None:
+            queryset = queryset.filter(author=self.author)
+        return queryset
+
+    def count(self):
+        if self._count is None:
+            self._count = self._fetch_count() if self.words else 0
+        return self._count
+
+    def _fetch_count(self):
+        if not enabled():
+            return self._queryset().count()
+        filters, params = self._filters()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {TABLE} '
+                f'JOIN posts_post p ON p.id = {TABLE}.rowid '
+                f'WHERE {TABLE} MATCH %s {filters}',
+                [match_expression(self.words), *params])
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, page):
+        if not self.words:
+            return []
+        if not enabled():
+            posts = list(self._queryset().select_related(
+                'author', 'group')[page])
+            for post in posts:
+                post.snippet = Truncator(post.text).words(SNIPPET_TOKENS)
+            return posts
+        filters, params = self._filters()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT p.id, snippet({TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {TABLE} JOIN posts_post p ON p.id = {TABLE}.rowid '
+                f'WHERE {TABLE} MATCH %s {filters} '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, ELLIPSIS, SNIPPET_TOKENS,
+                 match_expression(self.words), *params,
+                 page.stop - page.start, page.start])
+            snippets = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in snippets])
+        found = []
+        for pk, snippet in snippets:
+            if pk in posts:
+                posts[pk].snippet = highlight(snippet)
+                found.append(posts[pk])
+        return found
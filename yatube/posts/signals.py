@@ -0,0 +1,198 @@
+import threading
+
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (activity, blobs, counters, feed_cache, follow_graph,
+               timeline)
+from .models import (LOADED_FIELDS, Comment, Follow, Group, Post, User,
+                     UserStats)
+
+# Поля пользователя, которые видны на страницах лент.
+SHOWN_USER_FIELDS = frozenset(('username', 'first_name', 'last_name'))
+
+# Посты, которые сейчас удаляются в этом потоке.
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = ''
+    if not instance._state.adding:
+        loaded = getattr(instance, '_loaded_values', {})
+        if len(loaded) == len(LOADED_FIELDS):
+            saved = loaded['group_id'], loaded['image']
+        else:
+            # Пост собран не из базы или без этих полей: читаем их.
+            saved = Post.objects.filter(pk=instance.pk).values_list(
+                *LOADED_FIELDS).first()
+        instance._saved_group_id, instance._saved_image = saved or (None, '')
+    instance._loaded_values = {
+        'group_id': instance.group_id, 'image': instance.image.name}
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.push_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.add_user_stat(instance.author_id, 'posts_count', 1)
+        counters.add_group_posts(instance.group_id, 1)
+    elif instance._saved_group_id != instance.group_id:
+        counters.add_group_posts(instance._saved_group_id, -1)
+        counters.add_group_posts(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.add_user_stat(instance.author_id, 'posts_count', -1)
+    counters.add_group_posts(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, **kwargs):
+    saved_image = getattr(instance, '_saved_image', '')
+    if not created and saved_image != instance.image.name:
+        blobs.schedule_release(saved_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    blobs.schedule_release(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.add_post_comments(instance.post_id, 1)
+
+
+@receiver(pre_delete, sender=Post)
+def mark_deleted_post(sender, instance, **kwargs):
+    # Комментарии удаляются каскадом раньше поста: их сигналам незачем
+    # править счётчик и отметки поста, который сейчас исчезнет.
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unmark_deleted_post(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if instance.post_id not in _deleting_posts():
+        counters.add_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.add_user_stat(instance.author_id, 'followers_count', 1)
+        counters.add_user_stat(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_graph(sender, instance, **kwargs):
+    follow_graph.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.add_user_stat(instance.author_id, 'followers_count', -1)
+    counters.add_user_stat(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, **kwargs):
+    previous_group_id = getattr(instance, '_saved_group_id', None)
+    feed_cache.invalidate_post(instance, previous_group_id)
+    activity.touch(
+        group_ids=(instance.group_id, previous_group_id),
+        author_ids=(instance.author_id,))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    feed_cache.invalidate_post(instance)
+    activity.touch(
+        group_ids=(instance.group_id,), author_ids=(instance.author_id,))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    # Комментарии видны только на странице поста, лент они не меняют.
+    if instance.post_id not in _deleting_posts():
+        feed_cache.bump(feed_cache.post_scope(instance.post_id))
+        activity.touch(post_ids=(instance.post_id,))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_followed_author(sender, instance, **kwargs):
+    activity.touch(author_ids=(instance.author_id,))
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group(sender, instance, created, **kwargs):
+    # Ссылки на группу с её адресом есть на страницах других лент.
+    feed_cache.bump(feed_cache.NAMES, feed_cache.group_scope(instance.pk))
+    if not created:
+        activity.touch_renamed_group(instance.pk)
+
+
+def _shown_fields_saved(update_fields):
+    return update_fields is None or bool(
+        SHOWN_USER_FIELDS.intersection(update_fields))
+
+
+@receiver(pre_save, sender=User)
+def remember_user_names(sender, instance, update_fields, **kwargs):
+    instance._saved_names = None
+    if not instance._state.adding and _shown_fields_saved(update_fields):
+        instance._saved_names = User.objects.filter(
+            pk=instance.pk).values(*SHOWN_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    # Вход и смена пароля имён на страницах не меняют.
+    saved = getattr(instance, '_saved_names', None)
+    if created or saved is None or all(
+            getattr(instance, field) == value
+            for field, value in saved.items()):
+        return
+    feed_cache.bump(feed_cache.NAMES, feed_cache.author_scope(instance.pk))
+    activity.touch(author_ids=(instance.pk,))
+    activity.touch_renamed_author(instance.pk)
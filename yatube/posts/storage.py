@@ -0,0 +1,80 @@
+"""
+Хранилище картинок постов с именами по содержимому.
+
+Файл называется по SHA-256 своих байтов: posts/ab/<sha256>.jpg.
+Одинаковые загрузки ложатся в один файл и делят его миниатюры.
+Удаляет файлы, на которые больше нет ссылок, posts.blobs.release.
+
+Файл пишется при каждой загрузке, даже если он уже есть: так у него
+свежее время изменения, и release не удалит файл, пока пост с ним
+не зафиксирован (см. posts.blobs). Запись идёт во временный файл
+рядом и заменяет прежний через os.replace, поэтому читатели не видят
+файл недописанным.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+CHUNK_SIZE = 64 * 1024
+# Права файла, если FILE_UPLOAD_PERMISSIONS не задан: mkstemp
+# создаёт файл только для владельца.
+DEFAULT_PERMISSIONS = 0o644
+
+
+def digest(content):
+    """SHA-256 содержимого файла; позиция чтения возвращается в начало."""
+    sha256 = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        sha256.update(chunk)
+    content.seek(0)
+    return sha256.hexdigest()
+
+
+def content_name(name, content):
+    """Имя файла по содержимому в том же каталоге и с тем же расширением."""
+    directory, basename = os.path.split(name)
+    extension = os.path.splitext(basename)[1].lower()
+    sha256 = digest(content)
+    return os.path.join(directory, sha256[:2], sha256 + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content)
+        self._replace(name, content)
+        return name
+
+    def _replace(self, name, content):
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    file.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode
+                     or DEFAULT_PERMISSIONS)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def is_content_addressed(self, name):
+        """Лежит ли файл уже под именем по содержимому."""
+        basename = os.path.basename(name)
+        sha256 = os.path.splitext(basename)[0]
+        return (
+            len(sha256) == 64
+            and os.path.basename(os.path.dirname(name)) == sha256[:2]
+        )
@@ -0,0 +1,81 @@
+import datetime
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _bound(queryset, field_name, ordering):
+    value = queryset.order_by(ordering).values_list(
+        field_name, flat=True).first()
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def fast_date_hierarchy(cl):
+    """
+    date_hierarchy без SELECT DISTINCT по всей таблице: годы, месяцы
+    и дни берутся из календаря между первой и последней датой
+    changelist (с уже применённым фильтром по дате), которые находятся
+    по индексу двумя запросами. Выбранный день показывается как
+    у стандартного тега.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    year = cl.params.get(year_field)
+    month = cl.params.get(month_field)
+    if cl.params.get(f'{field_name}__day'):
+        return date_hierarchy(cl)
+    first = _bound(cl.queryset, field_name, field_name)
+    last = _bound(cl.queryset, field_name, f'-{field_name}')
+    if first is None:
+        return {'show': False}
+    if not year and first.year == last.year:
+        year = first.year
+        if first.month == last.month:
+            month = first.month
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if year and month:
+        year, month = int(year), int(month)
+        days = range(first.day, last.day + 1)
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year}), 'title': str(year)},
+            'choices': [{
+                'link': link({
+                    year_field: year, month_field: month,
+                    f'{field_name}__day': day,
+                }),
+                'title': capfirst(formats.date_format(
+                    datetime.date(year, month, day), 'MONTH_DAY_FORMAT')),
+            } for day in days],
+        }
+    if year:
+        year = int(year)
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [{
+                'link': link({year_field: year, month_field: month}),
+                'title': capfirst(formats.date_format(
+                    datetime.date(year, month, 1), 'YEAR_MONTH_FORMAT')),
+            } for month in range(first.month, last.month + 1)],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [{
+            'link': link({year_field: str(year)}),
+            'title': str(year),
+        } for year in range(first.year, last.year + 1)],
+    }
@@ -0,0 +1,18 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Ищет миниатюры всех постов страницы одним обращением."""
+    thumbnails.prefetch(posts)
+    return ''
+
+
+@register.simple_tag
+def post_picture(post):
+    """Варианты картинки поста для <picture> или None, пока они строятся."""
+    return thumbnails.picture(post)
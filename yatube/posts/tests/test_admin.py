@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import admin
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.author = User.objects.create_user(username='author')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description='Описание')
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                author=self.author, text=f'Пост {number}',
+                group=self.groups[number % len(self.groups)])
+            Comment.objects.create(
+                post=post, author=self.author, text=f'Комментарий {number}')
+
+    def queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_constant_queries_per_page(self):
+        """Проверка: число запросов не растёт с числом строк на странице."""
+        for model in ('post', 'comment'):
+            url = reverse(f'admin:posts_{model}_changelist')
+            with self.subTest(model=model):
+                self.add(2)
+                few = self.queries(url)
+                self.add(20)
+                self.assertEqual(self.queries(url), few)
+
+    def test_estimated_count_for_unfiltered_list(self):
+        """Проверка: без фильтров строки оцениваются, с фильтром считаются."""
+        self.add(3)
+        Post.objects.filter(pk=Post.objects.order_by('pk').first().pk).delete()
+        url = reverse('admin:posts_post_changelist')
+        with mock.patch.object(admin, 'EXACT_COUNT_LIMIT', 1):
+            response = self.client.get(url)
+            self.assertEqual(response.context['cl'].result_count,
+                             Post.objects.order_by('-pk').first().pk)
+            response = self.client.get(
+                url, {'group__id__exact': self.groups[1].pk})
+            self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_date_hierarchy(self):
+        """Проверка: иерархия дат строится от первой и последней даты."""
+        self.add(2)
+        post = Post.objects.order_by('pk').first()
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=post.pub_date.replace(year=post.pub_date.year - 2))
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url)
+        year = post.pub_date.year
+        for shown in (year - 2, year - 1, year):
+            self.assertContains(response, f'?pub_date__year={shown}')
+        response = self.client.get(url, {'pub_date__year': year})
+        self.assertContains(
+            response, f'pub_date__month={post.pub_date.month}')
+
+    def test_list_editable_saves_group(self):
+        """Проверка: группа правится прямо в списке постов."""
+        self.add(2)
+        posts = list(Post.objects.order_by('-pub_date', '-pk'))
+        data = {
+            'form-TOTAL_FORMS': 2, 'form-INITIAL_FORMS': 2,
+            'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+            '_save': 'Сохранить',
+        }
+        for number, post in enumerate(posts):
+            data[f'form-{number}-id'] = post.pk
+            data[f'form-{number}-group'] = self.groups[4].pk
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(Post.objects.values_list('group', flat=True)),
+            {self.groups[4].pk})
@@ -0,0 +1,146 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}',
+                group=cls.group if number % 2 else None)
+            for number in range(5)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, kwargs=None, **params):
+        return self.client.get(reverse(name, kwargs=kwargs), params)
+
+    def test_feeds(self):
+        """Проверка: каждая лента отдаёт свои посты от новых к старым."""
+        self.client.force_login(self.reader)
+        feeds = (
+            ('posts:api_index', None, self.posts),
+            ('posts:api_group_list', {'slug': 'group'},
+             [post for post in self.posts if post.group_id]),
+            ('posts:api_profile', {'username': 'author'}, self.posts),
+            ('posts:api_follow_index', None, self.posts),
+        )
+        for name, kwargs, posts in feeds:
+            with self.subTest(name=name):
+                response = self.get(name, kwargs)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(
+                    [post['id'] for post in response.json()['results']],
+                    [post.pk for post in reversed(posts)])
+
+    def test_serialization_is_compact(self):
+        """Проверка: поля поста и компактный JSON без пробелов."""
+        response = self.get('posts:api_index', limit=1)
+        self.assertEqual(response.json()['results'], [{
+            'id': self.posts[4].pk,
+            'text': 'Пост 4',
+            'pub_date': self.posts[4].pub_date.isoformat(),
+            'author': 'author',
+            'group': None,
+            'image': None,
+            'comments_count': 0,
+        }])
+        self.assertNotIn(b', ', response.content)
+        self.assertIn('Пост 4'.encode(), response.content)
+
+    def test_sparse_fields(self):
+        """Проверка: ?fields оставляет только запрошенные поля."""
+        response = self.get('posts:api_index', fields='id,text')
+        for post in response.json()['results']:
+            self.assertEqual(set(post), {'id', 'text'})
+        response = self.get('posts:api_index', fields='id,password')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['error'])
+
+    def test_cursor_pagination(self):
+        """Проверка: курсор next ведёт на следующую порцию постов."""
+        first = self.get('posts:api_index', limit=2).json()
+        self.assertIsNone(first['previous'])
+        second = self.get(
+            'posts:api_index', limit=2, after=first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in first['results'] + second['results']],
+            [post.pk for post in reversed(self.posts[1:])])
+        back = self.get(
+            'posts:api_index', limit=2, before=second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        response = self.get('posts:api_index', limit=0)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_not_modified_before_queries(self):
+        """Проверка: If-None-Match отвечается 304 без чтения постов."""
+        url = reverse('posts:api_index')
+        tag = self.client.get(url)['ETag']
+        # Кэш процесса не участвует: другой процесс даст тот же ETag.
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], tag)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], tag)
+
+    def test_index_etag_follows_renames_and_deletes(self):
+        """Проверка: ETag главной меняют переименования и удаление поста."""
+        url = reverse('posts:api_index')
+
+        def rename_group():
+            self.group.slug = 'renamed'
+            self.group.save()
+
+        def rename_author():
+            self.author.username = 'renamed'
+            self.author.save()
+
+        def delete_post():
+            Post.objects.get(pk=self.posts[0].pk).delete()
+
+        for change in (rename_group, rename_author, delete_post):
+            with self.subTest(change=change.__name__):
+                tag = self.client.get(url)['ETag']
+                change()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=tag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_follows_comments(self):
+        """Проверка: комментарий меняет ETag ленты автора."""
+        url = reverse('posts:api_profile', kwargs={'username': 'author'})
+        tag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_feed(self):
+        """Проверка: лента подписок требует входа и отвечает 304."""
+        response = self.get('posts:api_follow_index')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertIn('error', response.json())
+        self.client.force_login(self.reader)
+        url = reverse('posts:api_follow_index')
+        tag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertIn('private', response['Cache-Control'])
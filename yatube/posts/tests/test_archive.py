@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from http import HTTPStatus
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import archive
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_KVSTORE_FILE=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
+class AccountArchiveTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user')
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        # Та же картинка во втором посте попадает в архив один раз.
+        self.copy = Post.objects.create(
+            author=self.user, text='Копия', image=self.post.image.name)
+        Post.objects.create(author=self.user, text='Пропавший файл',
+                            image='posts/missing.gif')
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        Post.objects.create(author=self.author, text='Чужой пост')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.author, author=self.user)
+        self.client.force_login(self.user)
+
+    def download(self):
+        response = self.client.get(reverse('posts:account_archive'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('yatube-user.zip', response['Content-Disposition'])
+        return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+    def test_guest_is_redirected(self):
+        """Проверка: архив доступен только после входа."""
+        self.client.logout()
+        response = self.client.get(reverse('posts:account_archive'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_archive_contains_user_data(self):
+        """Проверка: в архиве посты, комментарии, подписки и картинки."""
+        with self.download() as result:
+            posts = json.loads(result.read('posts.json'))
+            comments = json.loads(result.read('comments.json'))
+            image = archive.image_path(self.post.image.name)
+            self.assertEqual(
+                [post['text'] for post in posts],
+                ['Пост с картинкой', 'Копия', 'Пропавший файл'])
+            self.assertEqual(posts[0]['group'], 'group')
+            self.assertEqual(posts[0]['image'], image)
+            self.assertEqual(
+                posts[0]['pub_date'], self.post.pub_date.isoformat())
+            self.assertEqual(comments, [{
+                'id': self.comment.pk,
+                'post': self.post.pk,
+                'text': 'Комментарий',
+                'pub_date': self.comment.pub_date.isoformat(),
+            }])
+            self.assertEqual(
+                json.loads(result.read('following.json')), ['author'])
+            self.assertEqual(
+                json.loads(result.read('followers.json')), ['author'])
+            self.assertEqual(result.read(image), SMALL_GIF)
+            self.assertEqual(
+                [name for name in result.namelist()
+                 if name.startswith(archive.IMAGES)], [image])
+
+    def test_empty_account(self):
+        """Проверка: архив пустого аккаунта - пустые списки."""
+        self.client.force_login(User.objects.create_user(username='new'))
+        response = self.client.get(reverse('posts:account_archive'))
+        with zipfile.ZipFile(
+                BytesIO(b''.join(response.streaming_content))) as result:
+            self.assertIsNone(result.testzip())
+            for name in result.namelist():
+                self.assertEqual(json.loads(result.read(name)), [])
@@ -0,0 +1,74 @@
+import json
+from http import HTTPStatus
+
+from django.test import TestCase
+
+from .. import benchmark
+from ..models import Comment, Follow, Post, TimelineEntry
+from ..urls import urlpatterns
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmark.seed(
+            users=30, authors=6, posts=60, groups=3, follows=3,
+            comments=20, hot_posts=2, hot_comments=15,
+        )
+        cls.follows = Follow.objects.count()
+
+    def test_seed_skews_followers_and_comments(self):
+        """Проверка: подписчики и комментарии распределены неравномерно."""
+        followers = sorted(
+            Follow.objects.values_list('author_id', flat=True))
+        top_author = max(set(followers), key=followers.count)
+        self.assertGreater(
+            followers.count(top_author), len(followers) / 6)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertGreaterEqual(
+            Post.objects.order_by('-comments_count')[0].comments_count, 15)
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_seed_spreads_dates(self):
+        """Проверка: посты опубликованы за весь DATE_SPAN, по порядку id."""
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True))
+        self.assertGreater(
+            dates[-1] - dates[0], benchmark.DATE_SPAN * 0.9)
+        self.assertEqual(dates, sorted(dates))
+        for post_date, comment_date in Comment.objects.values_list(
+                'post__pub_date', 'pub_date'):
+            self.assertGreaterEqual(comment_date, post_date)
+
+    def test_run_measures_every_url(self):
+        """Проверка: каждый адрес замерен анонимом и читателем."""
+        results = benchmark.run(requests=3, warmup=1)
+        self.assertEqual(
+            {(row['name'], row['user']) for row in results},
+            {(pattern.name, user) for pattern in urlpatterns
+             if pattern.name not in benchmark.MUTATING
+             for user in ('anonymous', 'authenticated')})
+        self.assertEqual(
+            Follow.objects.count(), self.follows, 'замер сменил подписки')
+        search = next(row for row in results if row['name'] == 'search')
+        self.assertIn('?q=', search['path'])
+        for row in results:
+            with self.subTest(name=row['name'], user=row['user']):
+                self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+                self.assertLessEqual(row['p95_ms'], row['p99_ms'])
+                if (row['name'], row['user']) == (
+                        'api_follow_index', 'anonymous'):
+                    # JSON-лента подписок не уводит на вход, а отвечает 401.
+                    self.assertEqual(row['status'], HTTPStatus.UNAUTHORIZED)
+                else:
+                    self.assertLess(row['status'], 400)
+        json.dumps(results)
+
+    def test_percentile_nearest_rank(self):
+        """Проверка: перцентиль берётся по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
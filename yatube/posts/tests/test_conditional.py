@@ -0,0 +1,126 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = {
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+        }
+
+    def etags(self, client):
+        return {name: client.get(url)['ETag']
+                for name, url in self.urls.items()}
+
+    def test_not_modified_before_heavy_queries(self):
+        """Проверка: 304 после одного запроса отметок (и сессии)."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.reader_client.get(url)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('Cookie', response['Vary'])
+                with self.assertNumQueries(3):
+                    response = self.reader_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                response = self.reader_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_pages_without_user_stats(self):
+        """Проверка: без строки счётчиков автора страницы открываются."""
+        UserStats.objects.filter(user=self.author).delete()
+        for name in ('post_detail', 'profile'):
+            with self.subTest(name=name):
+                response = self.reader_client.get(self.urls[name])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('ETag', response)
+
+    def test_cached_page_answers_not_modified(self):
+        """Проверка: страница из кэша анонимов тоже отвечает 304."""
+        url = self.urls['post_detail']
+        tag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_etag_depends_on_user(self):
+        """Проверка: у гостя и читателя разные версии страниц."""
+        guest, reader = self.etags(self.client), self.etags(self.reader_client)
+        for name in self.urls:
+            with self.subTest(name=name):
+                self.assertNotEqual(guest[name], reader[name])
+
+    def test_changes_move_markers(self):
+        """Проверка: комментарий, пост и подписка меняют ETag страниц."""
+        changes = (
+            (lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+             ('post_detail',)),
+            (lambda: Post.objects.create(
+                author=self.author, text='Ещё пост', group=self.group),
+             self.urls),
+            (lambda: Follow.objects.create(
+                user=self.reader, author=self.author),
+             ('post_detail', 'profile')),
+        )
+        for change, changed in changes:
+            before = self.etags(self.reader_client)
+            change()
+            after = self.etags(self.reader_client)
+            for name in changed:
+                with self.subTest(name=name):
+                    self.assertNotEqual(before[name], after[name])
+
+    def test_renames_move_markers(self):
+        """Проверка: переименования меняют ETag страниц, где видно имя."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+
+        def rename(obj, **fields):
+            def change():
+                for field, value in fields.items():
+                    setattr(obj, field, value)
+                obj.save()
+            return change
+
+        changes = (
+            ('author', rename(self.author, first_name='Автор'),
+             ('group_list', 'post_detail')),
+            ('commenter', rename(self.reader, username='commenter'),
+             ('post_detail',)),
+            ('group', rename(self.group, title='Новое название'),
+             ('profile', 'post_detail')),
+        )
+        for name, change, changed in changes:
+            before = self.etags(self.client)
+            change()
+            for page in changed:
+                with self.subTest(change=name, page=page):
+                    response = self.client.get(
+                        self.urls[page], HTTP_IF_NONE_MATCH=before[page])
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,126 @@
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..feeds import FEED_ENTRIES
+from ..models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {number}', group=self.group)
+            for number in range(FEED_ENTRIES + 2)
+        ]
+        self.foreign = Post.objects.create(author=self.other, text='Чужой')
+
+    def rss_titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        root = ElementTree.fromstring(response.content)
+        return [item.findtext('title') for item in root.iter('item')]
+
+    def test_feeds_show_latest_posts_of_scope(self):
+        """Проверка: в каждой ленте последние посты своей выборки."""
+        latest = [f'Пост {number}' for number in
+                  range(FEED_ENTRIES + 1, 1, -1)]
+        feeds = (
+            (reverse('posts:index_rss'), ['Чужой', *latest[:-1]]),
+            (reverse('posts:group_rss', kwargs={'slug': 'group'}), latest),
+            (reverse('posts:profile_rss', kwargs={'username': 'author'}),
+             latest),
+        )
+        for url, titles in feeds:
+            with self.subTest(url=url):
+                self.assertEqual(self.rss_titles(url), titles)
+
+    def test_atom_feed(self):
+        """Проверка: Atom-лента с подзаголовком и ссылками на посты."""
+        response = self.client.get(
+            reverse('posts:group_atom', kwargs={'slug': 'group'}))
+        root = ElementTree.fromstring(response.content)
+        self.assertEqual(root.findtext(f'{ATOM}subtitle'), 'Описание')
+        entries = root.findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), FEED_ENTRIES)
+        self.assertTrue(entries[0].find(f'{ATOM}link').get('href').endswith(
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.posts[-1].pk})))
+
+    def test_unknown_scope(self):
+        """Проверка: лента несуществующей группы или автора - 404."""
+        for url in (reverse('posts:group_rss', kwargs={'slug': 'none'}),
+                    reverse('posts:profile_atom',
+                            kwargs={'username': 'none'})):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cached_and_conditional(self):
+        """Проверка: опрос ленты - из кэша и 304, пока нет новых постов."""
+        url = reverse('posts:group_rss', kwargs={'slug': 'group'})
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=first['ETag'])
+            since = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(since.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(
+            author=self.author, text='Новый пост', group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Новый пост')
+
+    def test_renames_refresh_feeds(self):
+        """Проверка: новые имена видны и в лентах других объектов."""
+        index = reverse('posts:index_rss')
+        group = reverse('posts:group_rss', kwargs={'slug': 'group'})
+        profile = reverse('posts:profile_rss', kwargs={'username': 'author'})
+
+        def rename_group():
+            self.group.title = 'Новое название'
+            self.group.save()
+
+        def rename_author():
+            self.author.first_name = 'Лев'
+            self.author.save()
+
+        changes = (
+            (rename_group, 'Новое название', (index, profile)),
+            (rename_author, 'Лев', (index, group)),
+        )
+        for change, name, urls in changes:
+            for url in urls:
+                self.client.get(url)
+            change()
+            for url in urls:
+                with self.subTest(change=change.__name__, url=url):
+                    response = self.client.get(url)
+                    self.assertEqual(response['X-Page-Cache'], 'MISS')
+                    self.assertContains(response, name)
+
+    def test_pages_link_feeds(self):
+        """Проверка: страницы лент ссылаются на свои RSS и Atom."""
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'group'}))
+        self.assertContains(
+            response, reverse('posts:group_rss', kwargs={'slug': 'group'}))
+        self.assertContains(
+            response, reverse('posts:group_atom', kwargs={'slug': 'group'}))
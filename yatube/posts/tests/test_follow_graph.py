@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import follow_graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.authors = [
+            User.objects.create_user(username=f'author_{number}')
+            for number in range(3)
+        ]
+        for author in reversed(self.authors[:2]):
+            Follow.objects.create(user=self.reader, author=author)
+
+    def test_reads_database_once(self):
+        """Проверка: подписки читаются из базы только при промахе."""
+        with self.assertNumQueries(1):
+            following = follow_graph.following(self.reader.pk)
+        self.assertEqual(
+            list(following), sorted(author.pk for author in self.authors[:2]))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(
+                self.reader.pk, self.authors[0].pk))
+            self.assertFalse(follow_graph.is_following(
+                self.reader.pk, self.authors[2].pk))
+        self.assertFalse(follow_graph.is_following(
+            self.authors[0].pk, self.reader.pk))
+
+    def test_writes_invalidate(self):
+        """Проверка: подписка и отписка сбрасывают массив в кэше."""
+        follow_graph.following(self.reader.pk)
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        Follow.objects.filter(
+            user=self.reader, author=self.authors[0]).delete()
+        with self.assertNumQueries(1):
+            following = follow_graph.following(self.reader.pk)
+        self.assertEqual(
+            list(following), sorted(author.pk for author in self.authors[1:]))
+        with self.assertNumQueries(0):
+            follow_graph.following(self.reader.pk)
+
+    def test_invalidated_again_on_commit(self):
+        """Проверка: массив, прочитанный до фиксации, сбрасывается."""
+        with mock.patch.object(
+                follow_graph.transaction, 'on_commit') as on_commit:
+            Follow.objects.create(user=self.reader, author=self.authors[2])
+            follow_graph.following(self.reader.pk)
+        on_commit.call_args[0][0]()
+        with self.assertNumQueries(1):
+            follow_graph.following(self.reader.pk)
+
+    def test_repeated_follow(self):
+        """Проверка: повторная подписка не дублирует запись."""
+        self.client.force_login(self.reader)
+        url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.authors[0].username})
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 2)
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.authors[0].username}))
+        self.assertTrue(response.context['following'])
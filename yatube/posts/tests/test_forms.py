@@ -1,22 +1,40 @@
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail.images import ImageFile
 
+from .. import thumbnails
+from ..kvstore import KVStore
 from ..models import Comment, Group, Post
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_KVSTORE_FILE=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
 class PostFormTests(TestCase):
 
     @classmethod
@@ -88,7 +106,8 @@ class PostFormTests(TestCase):
             text=form_data['text'],
             group=form_data['group'],
             author=self.author,
-            image='posts/small.gif'
+            image__startswith='posts/',
+            image__endswith='.jpg',
         ).exists())
 
     def test_posts_forms_edit_post(self):
@@ -246,3 +265,146 @@ class PostFormTests(TestCase):
         )
         self.assertEqual(response.status_code, HTTPStatus.FOUND)
         self.assertEqual(Comment.objects.count(), comment_count)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_WORKERS=0,
+    THUMBNAIL_KVSTORE_FILE=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
+class ThumbnailsTest(TransactionTestCase):
+    """
+    Миниатюры строятся после фиксации транзакции, поэтому тест
+    транзакционный; THUMBNAIL_WORKERS=0 строит их в том же потоке.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.client.force_login(self.author)
+
+    def upload(self, name):
+        return SimpleUploadedFile(
+            name=name, content=SMALL_GIF, content_type='image/gif')
+
+    def test_form_save_builds_thumbnails(self):
+        """Проверка: миниатюры готовы сразу после сохранения формы."""
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой', 'image': self.upload('form.gif')})
+        post = Post.objects.get()
+        thumbnails.prefetch([post])
+        for variant, thumbnail in post.prefetched_thumbnails.items():
+            with self.subTest(variant=variant):
+                self.assertIsNotNone(thumbnail)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, '/media/cache/')
+        self.assertContains(response, 'srcset=')
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_placeholder_replaced_when_thumbnail_is_ready(self):
+        """Проверка: пока миниатюры нет - заглушка, потом картинка, не 304."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=self.upload('late.gif'))
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        guest_client = Client()
+        placeholder = guest_client.get(url)
+        self.assertContains(placeholder, 'Изображение обрабатывается')
+        response = guest_client.get(
+            url, HTTP_IF_NONE_MATCH=placeholder['ETag'])
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, '/media/cache/')
+
+    def test_missing_source_checked_once(self):
+        """Проверка: пропавший исходник не ищется на каждом показе."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=self.upload('gone.gif'))
+        with mock.patch.object(
+                thumbnails, '_exists', return_value=False) as exists:
+            for _ in range(2):
+                thumbnails.prefetch([Post.objects.get(pk=post.pk)])
+        self.assertEqual(exists.call_count, 1)
+
+    def test_feed_page_prefetches_thumbnails_in_one_lookup(self):
+        """Проверка: миниатюры страницы ленты ищутся одним запросом."""
+        for number in range(3):
+            self.client.post(reverse('posts:post_create'), data={
+                'text': f'Пост {number}',
+                'image': self.upload(f'feed_{number}.gif'),
+            })
+        cache.clear()
+        with mock.patch.object(
+                KVStore, '_get_many_raw',
+                autospec=True, side_effect=KVStore._get_many_raw) as lookup:
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(
+            len(lookup.call_args[0][1]), 3 * len(thumbnails.VARIANTS))
+        self.assertEqual(response.content.decode().count('<picture>'), 3)
+
+    def test_kvstore_survives_new_process(self):
+        """Проверка: записи хранилища видны новому экземпляру."""
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост', 'image': self.upload('persist.gif')})
+        post = Post.objects.get()
+        store = KVStore()
+        self.assertIsNotNone(store.get(ImageFile(post.image)))
+        geometry, options = thumbnails.VARIANTS[
+            thumbnails.FALLBACK_FORMAT, thumbnails.BASE_WIDTH]
+        thumbnail = thumbnails.backend.thumbnail_file(
+            post.image, geometry, **options)
+        self.assertEqual(
+            [image.name for image in store.get_many([thumbnail])],
+            [thumbnail.name])
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_KVSTORE_FILE=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+    IMAGE_MAX_SIZE=100,
+)
+class ImageIngestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def create(self, image, name, **params):
+        content = BytesIO()
+        image.save(content, **params)
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content.getvalue()),
+        })
+        return Image.open(Post.objects.latest('pk').image)
+
+    def test_photo_is_capped_and_stripped(self):
+        """Проверка: фото ужато, без EXIF, в прогрессивном JPEG."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        # Orientation 6: снимок повёрнут, его надо развернуть.
+        exif[0x0112] = 6
+        image = self.create(
+            Image.new('RGB', (400, 200), 'red'), 'photo.jpeg',
+            format='JPEG', exif=exif.tobytes())
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (50, 100))
+        self.assertFalse(image.getexif())
+        self.assertTrue(image.info.get('progressive'))
+
+    def test_transparent_image_keeps_alpha(self):
+        """Проверка: картинка с прозрачностью не теряет её."""
+        image = self.create(
+            Image.new('RGBA', (50, 50), (255, 0, 0, 0)), 'alpha.png',
+            format='PNG')
+        self.assertIn(image.format, ('PNG', 'WEBP'))
+        self.assertEqual(image.mode, 'RGBA')
+        self.assertEqual(image.size, (50, 50))
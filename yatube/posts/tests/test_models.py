@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Comment, Follow, Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -158,3 +163,107 @@ class FollowModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     follow._meta.get_field(value).verbose_name, expected)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+
+    def assertCounters(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_post_counters(self):
+        """Проверяем счётчики постов автора и группы."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        self.assertCounters(self.author, posts_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.other_group.posts_count, 0)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertCounters(self.author, posts_count=0)
+
+    def test_post_delete_cost_independent_of_comments(self):
+        """Проверка: каскад комментариев не добавляет запросов."""
+        queries = []
+        for number in (1, 20):
+            post = Post.objects.create(author=self.author, text='Пост')
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.user, text='Комментарий')
+                for _ in range(number))
+            with CaptureQueriesContext(connection) as captured:
+                post.delete()
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_counter(self):
+        """Проверяем счётчик комментариев поста."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Проверяем счётчики подписчиков и подписок."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertCounters(self.author, followers_count=1)
+        self.assertCounters(self.user, following_count=1)
+        Follow.objects.filter(user=self.user).delete()
+        self.assertCounters(self.author, followers_count=0)
+        self.assertCounters(self.user, following_count=0)
+
+    def test_recount_repairs_drift(self):
+        """Проверяем, что recount_counters чинит разошедшиеся счётчики."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7)
+        Group.objects.update(posts_count=7)
+        Post.objects.update(comments_count=7)
+        UserStats.objects.filter(user=self.user).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(
+            self.author, posts_count=1, followers_count=1, following_count=0)
+        self.assertCounters(
+            self.user, posts_count=0, followers_count=0, following_count=1)
+        self.group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,119 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса: "SCAN posts_post" без "USING".
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Справочники, которые читаются целиком намеренно: выбор группы в форме.
+WHOLE_TABLES = ('SCAN posts_group',)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+            description='test_description',
+        )
+        for number in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'Текст поста {number}',
+                group=cls.group,
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def plans(self, queries):
+        """Пары (sql, строка плана) для всех выполненных запросов."""
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for row in cursor.fetchall():
+                    if row[-1] not in WHOLE_TABLES:
+                        yield sql, row[-1]
+
+    def assertIndexedPlans(self, queries, url=None):
+        for sql, detail in self.plans(queries):
+            with self.subTest(url=url, sql=sql):
+                self.assertNotRegex(detail, FULL_SCAN)
+                self.assertNotIn(TEMP_SORT, detail)
+
+    def assertIndexedQueries(self, client, method, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            getattr(client, method)(url)
+        self.assertIndexedPlans(queries, url)
+
+    def feed_urls(self):
+        urls = []
+        for name, kwargs in (
+            ('posts:index', {}),
+            ('posts:group_list', {'slug': self.group.slug}),
+            ('posts:profile', {'username': self.author}),
+            ('posts:follow_index', {}),
+        ):
+            url = reverse(name, kwargs=kwargs)
+            page_obj = self.authorized_client.get(url).context['page_obj']
+            after = page_obj.paginator.next_cursor
+            page_obj = self.authorized_client.get(
+                f'{url}?after={after}').context['page_obj']
+            urls += [url, f'{url}?after={after}', f'{url}?page=2',
+                     f'{url}?before={page_obj.paginator.previous_cursor}']
+        return urls
+
+    def test_read_views_use_indexes(self):
+        """Запросы страниц не читают таблицы целиком и не сортируют."""
+        urls = self.feed_urls() + [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            self.assertIndexedQueries(self.authorized_client, 'get', url)
+            self.assertIndexedQueries(self.guest_client, 'get', url)
+
+    def test_write_views_use_indexes(self):
+        """Запросы, которые порождают изменения, тоже идут по индексам."""
+        author_client = Client()
+        author_client.force_login(self.author)
+        self.assertIndexedQueries(
+            self.authorized_client, 'post',
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}))
+        self.assertIndexedQueries(
+            self.authorized_client, 'get',
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author}))
+        self.assertIndexedQueries(
+            self.authorized_client, 'get',
+            reverse('posts:profile_follow', kwargs={'username': self.author}))
+        with CaptureQueriesContext(connection) as queries:
+            author_client.post(reverse('posts:post_create'), data={
+                'text': 'Новый пост', 'group': self.group.pk})
+        self.assertIndexedPlans(queries)
@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import enforce_query_budget
+
+from .. import search
+from ..models import Group, Post
+from ..views import POSTS_NUMBER
+
+User = get_user_model()
+
+
+@enforce_query_budget
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.rare = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Ёжик <b>в тумане</b> искал лошадку')
+        cls.frequent = Post.objects.create(
+            author=cls.other,
+            text='ёжик ежик ежики: про ежей этот пост целиком')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, **params):
+        return self.client.get(reverse('posts:search'), params)
+
+    def found(self, response):
+        return list(response.context['page_obj'])
+
+    def test_ranked_results_with_snippets(self):
+        """Проверка: посты ранжированы, слова подсвечены, текст экранирован."""
+        response = self.get(q='ежик')
+        self.assertEqual(self.found(response), [self.frequent, self.rare])
+        snippet = self.found(response)[1].snippet
+        self.assertIn('<mark>Ёжик</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+        self.assertContains(response, '<mark>Ёжик</mark>', html=False)
+        self.assertNotContains(response, '<b>в тумане</b>')
+
+    def test_all_words_required(self):
+        """Проверка: найдены только посты со всеми словами запроса."""
+        self.assertEqual(
+            self.found(self.get(q='ёжик лошад')), [self.rare])
+        self.assertEqual(self.found(self.get(q='лошадка слон')), [])
+
+    def test_filters(self):
+        """Проверка: поиск сужается группой и автором."""
+        self.assertEqual(
+            self.found(self.get(q='ежик', group=self.group.slug)),
+            [self.rare])
+        self.assertEqual(
+            self.found(self.get(q='ежик', author='other')), [self.frequent])
+        response = self.get(q='ежик', author='nobody')
+        self.assertIsNone(response.context['page_obj'])
+        self.assertTrue(response.context['form'].errors)
+
+    def test_index_follows_posts(self):
+        """Проверка: индекс следует за правкой, удалением и bulk-записью."""
+        post = Post.objects.get(pk=self.rare.pk)
+        post.text = 'Слон'
+        post.save()
+        self.assertEqual(self.found(self.get(q='лошадку')), [])
+        self.assertEqual(self.found(self.get(q='слон')), [post])
+        Post.objects.filter(pk=post.pk).update(text='Жираф')
+        self.assertEqual(self.found(self.get(q='жираф')), [post])
+        post.delete()
+        self.assertEqual(self.found(self.get(q='жираф')), [])
+        Post.objects.bulk_create([Post(author=self.author, text='Бегемот')])
+        self.assertEqual(len(self.found(self.get(q='бегемот'))), 1)
+
+    def test_repair_restores_triggers(self):
+        """Проверка: потерянные триггеры возвращаются с перестройкой."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {search.TABLE}_insert')
+        Post.objects.create(author=self.author, text='Носорог')
+        search.repair()
+        self.assertEqual(len(self.found(self.get(q='носорог'))), 1)
+        Post.objects.create(author=self.author, text='Носорог второй')
+        self.assertEqual(len(self.found(self.get(q='носорог'))), 2)
+
+    def test_pages_keep_query(self):
+        """Проверка: ссылки пагинатора сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Ежик номер {number}')
+            for number in range(POSTS_NUMBER))
+        response = self.get(q='ежик')
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         POSTS_NUMBER + 2)
+        self.assertContains(response, '?q=%D0%B5%D0%B6%D0%B8%D0%BA&page=2')
+        self.assertEqual(len(self.found(self.get(q='ежик', page=2))), 2)
+
+    def test_admin_search_uses_index(self):
+        """Проверка: поиск в админке идёт по индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'лошадку'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.rare])
+        self.assertFalse(any(
+            'LIKE' in query['sql'] for query in connection.queries))
@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def png(color):
+    content = BytesIO()
+    Image.new('RGB', (2, 1), color).save(content, 'PNG')
+    return content.getvalue()
+
+
+BLUE_PNG = png('blue')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    MEDIA_RELEASE_GRACE=0,
+    THUMBNAIL_WORKERS=0,
+    THUMBNAIL_KVSTORE_FILE=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
+class ContentAddressedStorageTest(TransactionTestCase):
+    """Файлы освобождаются после фиксации транзакции."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.client.force_login(self.author)
+
+    def create(self, name):
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост',
+            'image': SimpleUploadedFile(name, SMALL_GIF),
+        })
+        return Post.objects.latest('pk')
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+
+    def thumbnail_files(self, post):
+        thumbnails.prefetch([post])
+        return [thumbnail.name
+                for thumbnail in post.prefetched_thumbnails.values()]
+
+    def test_identical_uploads_share_file(self):
+        """Проверка: одинаковые загрузки - один файл и одни миниатюры."""
+        first = self.create('first.gif')
+        second = self.create('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            self.thumbnail_files(first), self.thumbnail_files(second))
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(first.image.path))), 1)
+
+    def test_upload_restores_released_file(self):
+        """Проверка: повторная загрузка заново пишет уже лежащий файл."""
+        post = self.create('first.gif')
+        path = post.image.path
+        with open(path, 'rb') as file:
+            content = file.read()
+        # Файл, который release вот-вот удалит, нельзя считать готовым.
+        with open(path, 'wb') as file:
+            file.write(b'released')
+        second = self.create('second.gif')
+        self.assertEqual(second.image.name, post.image.name)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), content)
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         [os.path.basename(path)])
+
+    def test_file_removed_with_last_reference(self):
+        """Проверка: файл удаляется вместе с последним постом."""
+        first = self.create('first.gif')
+        second = self.create('second.gif')
+        name = first.image.name
+        thumbnail_files = self.thumbnail_files(first)
+        first.delete()
+        self.assertTrue(self.exists(name))
+        second.delete()
+        self.assertFalse(self.exists(name))
+        for thumbnail in thumbnail_files:
+            with self.subTest(thumbnail=thumbnail):
+                self.assertFalse(self.exists(thumbnail))
+
+    def test_fresh_file_kept_until_sweep(self):
+        """Проверка: свежий файл остаётся до sweep_media."""
+        post = self.create('first.gif')
+        name = post.image.name
+        with self.settings(MEDIA_RELEASE_GRACE=60):
+            # Пост с той же картинкой мог быть ещё не зафиксирован.
+            post.delete()
+            self.assertTrue(self.exists(name))
+            call_command('sweep_media', stdout=StringIO())
+            self.assertTrue(self.exists(name))
+        call_command('sweep_media', grace=0, stdout=StringIO())
+        self.assertFalse(self.exists(name))
+
+    def test_sweep_keeps_referenced_files(self):
+        """Проверка: sweep_media не трогает файлы с постами."""
+        post = self.create('first.gif')
+        call_command('sweep_media', grace=0, stdout=StringIO())
+        self.assertTrue(self.exists(post.image.name))
+
+    def test_replaced_image_released(self):
+        """Проверка: заменённая при редактировании картинка удаляется."""
+        post = self.create('first.gif')
+        name = post.image.name
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={
+                'text': 'Пост',
+                'image': SimpleUploadedFile('new.png', BLUE_PNG),
+            })
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, name)
+        self.assertFalse(self.exists(name))
+
+    def test_dedup_command(self):
+        """Проверка: команда сводит старые одинаковые файлы в один."""
+        legacy = FileSystemStorage()
+        names = [
+            legacy.save(f'posts/legacy_{number}.gif', SimpleUploadedFile(
+                'legacy.gif', SMALL_GIF))
+            for number in range(2)
+        ]
+        for name in names:
+            Post.objects.create(author=self.author, text='Пост', image=name)
+        out = StringIO()
+        call_command('dedup_media', stdout=out)
+        self.assertIn(
+            'Перенесено файлов: 1, дубликатов: 1', out.getvalue())
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertTrue(self.exists(images.pop()))
+        for name in names:
+            with self.subTest(name=name):
+                self.assertFalse(self.exists(name))
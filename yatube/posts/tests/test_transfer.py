@@ -0,0 +1,115 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import transfer
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+PUB_DATE = datetime(2020, 5, 17, 12, 30, tzinfo=timezone.utc)
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=group, text=f'Пост {number}')
+            for number, group in enumerate((self.group, None, self.group))
+        ]
+        Post.objects.filter(pk=self.posts[0].pk).update(pub_date=PUB_DATE)
+        self.comment = Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def wipe(self):
+        Follow.objects.all().delete()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        self.reader.delete()
+
+    def round_trip(self, format_):
+        out = StringIO()
+        call_command(
+            'export_posts', self.directory.name, format=format_,
+            chunk_size=2, stdout=out)
+        self.assertTrue(os.path.exists(
+            transfer.path(self.directory.name, 'posts', format_)))
+        self.wipe()
+        call_command(
+            'import_posts', self.directory.name, format=format_,
+            batch_size=2, create_users=True, stdout=out)
+        return out.getvalue()
+
+    def check_restored(self):
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'group__slug')),
+            [(post.pk, post.text, post.group and 'group')
+             for post in self.posts])
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).pub_date,
+                         PUB_DATE)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post_id, self.posts[0].pk)
+        self.assertEqual(comment.author.username, 'reader')
+        self.assertEqual(Post.objects.get(
+            pk=self.posts[0].pk).comments_count, 1)
+        self.assertEqual(Group.objects.get().posts_count, 2)
+        self.assertEqual(UserStats.objects.get(
+            user=self.author).followers_count, 1)
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author=self.author).exists())
+        self.assertEqual(TimelineEntry.objects.filter(
+            user__username='reader').count(), 3)
+
+    def test_jsonl_round_trip(self):
+        """Проверка: выгрузка в JSONL и загрузка восстанавливают данные."""
+        output = self.round_trip(transfer.JSONL)
+        self.check_restored()
+        self.assertIn('строк/с', output)
+
+    def test_csv_round_trip(self):
+        """Проверка: выгрузка в CSV и загрузка восстанавливают данные."""
+        self.round_trip(transfer.CSV)
+        self.check_restored()
+
+    def test_import_skips_existing_and_unknown(self):
+        """Проверка: повторы и строки с неизвестными ссылками пропускаются."""
+        transfer.export(self.directory.name)
+        self.reader.delete()
+        done = transfer.Importer(batch_size=2).run(self.directory.name)
+        skipped = {progress.name: progress.skipped for progress in done}
+        rows = {progress.name: progress.rows for progress in done}
+        self.assertEqual(skipped, {
+            'groups': 1, 'posts': 3, 'comments': 1, 'follows': 1})
+        self.assertEqual(set(rows.values()), {0})
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Group.objects.count(), 1)
+
+    def test_import_backfills_only_touched_timelines(self):
+        """Проверка: загрузка дописывает только затронутые ленты подписок."""
+        other = User.objects.create_user(username='other')
+        Post.objects.create(author=other, text='Чужой пост')
+        Follow.objects.create(user=self.author, author=other)
+        transfer.export(self.directory.name)
+        Post.objects.filter(pk=self.posts[2].pk).delete()
+        TimelineEntry.objects.all().delete()
+        transfer.Importer().run(self.directory.name)
+        self.assertGreater(
+            Group.objects.get().last_activity, self.group.last_activity)
+        # У автора новый пост: его подписчик получает ленту автора, а
+        # подписка на автора без новых постов остаётся как была.
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user_id', 'author_id')),
+            {(self.reader.pk, self.author.pk)})
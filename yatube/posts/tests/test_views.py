@@ -1,22 +1,37 @@
+import os
 import shutil
 import tempfile
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from core.testing import enforce_query_budget
+
+from .. import page_cache, timeline
 from ..forms import CommentForm
-from ..models import Follow, Group, Post
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      UserStats)
+from ..views import COMMENTS_NUMBER, POSTS_NUMBER
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@enforce_query_budget
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_KVSTORE_FILE=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
 class ViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -257,6 +272,84 @@ class PaginatorViewsTest(TestCase):
                                  PaginatorViewsTest.NUMB_POST_SECOND_PAGE)
 
 
+class CursorPaginatorViewsTest(TestCase):
+
+    NUMB_OF_POSTS = 23
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+            description='test_description',
+        )
+        for post in range(CursorPaginatorViewsTest.NUMB_OF_POSTS):
+            Post.objects.create(
+                text=f'Текст поста {post}',
+                author=cls.author,
+                group=cls.group
+            )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk_feed(self, url):
+        """Проходит ленту по токенам ?after= и возвращает все страницы."""
+        pages = []
+        query = ''
+        while True:
+            response = self.authorized_client.get(url + query)
+            page_obj = response.context['page_obj']
+            pages.append(list(page_obj))
+            if not page_obj.has_next():
+                return pages, page_obj
+            query = f'?after={page_obj.paginator.next_cursor}'
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        """Проверка: курсорные страницы покрывают ленту без пропусков."""
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                pages, last_page = self.walk_feed(url)
+                self.assertEqual([len(page) for page in pages], [10, 10, 3])
+                self.assertEqual(sum(pages, []), expected)
+                response = self.authorized_client.get(
+                    f'{url}?before={last_page.paginator.previous_cursor}')
+                self.assertEqual(
+                    list(response.context['page_obj']), pages[1])
+
+    def test_cursor_page_does_not_count(self):
+        """Проверка: курсорная страница не выполняет COUNT и OFFSET."""
+        _, last_page = self.walk_feed(reverse('posts:index'))
+        url = (reverse('posts:group_list', kwargs={'slug': self.group.slug})
+               + f'?after={last_page.paginator.previous_cursor}')
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверка: битый токен отдает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?after=broken')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(Post.objects.order_by('-pub_date', '-pk')[:10]))
+
+
 class CacheTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -278,13 +371,60 @@ class CacheTest(TestCase):
         """Проверка кэширования главной страницы."""
         post = self.post
         response = self.authorized_client.get(reverse('posts:index'))
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='изменен в обход')
         response_two = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, response_two.content)
         cache.clear()
         response_three = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, response_three.content)
 
+    def test_feed_fragments_invalidated_by_signals(self):
+        """Проверка: изменения постов сбрасывают ленты, комментарии - нет."""
+        group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+            description='test_description',
+        )
+        post = Post.objects.create(
+            author=self.user, text='пост в группе', group=group)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+
+        def edit():
+            post.text = 'правка'
+            post.save()
+
+        versions = {
+            url: self.authorized_client.get(url).context['cache_version']
+            for url in urls
+        }
+        Comment.objects.create(post=post, author=self.user, text='коммент')
+        for url in urls:
+            with self.subTest(url=url, change='comment'):
+                response = self.authorized_client.get(url)
+                self.assertEqual(
+                    response.context['cache_version'], versions[url])
+        changes = (
+            edit,
+            lambda: Post.objects.create(
+                author=self.user, text='новый пост', group=group),
+            post.delete,
+        )
+        for change in changes:
+            before = {
+                url: self.authorized_client.get(url).context['cache_version']
+                for url in urls
+            }
+            change()
+            for url in urls:
+                with self.subTest(url=url, change=change):
+                    response = self.authorized_client.get(url)
+                    self.assertNotEqual(
+                        response.context['cache_version'], before[url])
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -302,6 +442,8 @@ class FollowTest(TestCase):
         )
 
     def setUp(self):
+        # Граф подписок в кэше пережил бы откат транзакции теста.
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
         self.authorized_client_author = Client()
@@ -357,3 +499,367 @@ class FollowTest(TestCase):
         response = self.authorized_client.get(
             reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'])
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.user_author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.user_author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_follow_backfills_timeline(self):
+        """Проверка: при подписке в ленту попадают старые посты автора."""
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.user_author}))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=self.old_post).exists())
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Проверка: новый пост раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.user, author=self.user_author)
+        post = Post.objects.create(author=self.user_author, text='Новый')
+        entry = TimelineEntry.objects.get(user=self.user, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(entry.author, self.user_author)
+
+    def test_unfollow_trims_timeline(self):
+        """Проверка: после отписки посты автора уходят из ленты."""
+        Follow.objects.create(user=self.user, author=self.user_author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user_author}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+
+@override_settings(FEED_PULL_THRESHOLD=1)
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+        Follow.objects.create(user=cls.user, author=cls.author)
+        timeline.refresh_pull_authors()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_star_posts_are_pulled_not_pushed(self):
+        """Проверка: посты популярного автора не раскладываются по лентам."""
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_merged_feed_pages_in_order(self):
+        """Проверка: слитая лента листается курсором без пропусков."""
+        for number in range(12):
+            Post.objects.create(
+                author=(self.star, self.author)[number % 2],
+                text=f'Пост {number}',
+            )
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        url = reverse('posts:follow_index')
+        first = self.authorized_client.get(url).context['page_obj']
+        second = self.authorized_client.get(
+            f'{url}?after={first.paginator.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), expected)
+        self.assertFalse(second.has_next())
+        legacy = self.authorized_client.get(f'{url}?page=2')
+        self.assertEqual(list(legacy.context['page_obj']), list(second))
+
+    def test_star_back_on_push_gets_backfilled(self):
+        """Проверка: вернувшийся на раскладку автор попадает в ленты."""
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user, post=post).exists())
+        call_command('feed_paths', stdout=StringIO())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=post).exists())
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_feed_paths_command(self):
+        """Проверка: команда feed_paths показывает авторов на чтении."""
+        out = StringIO()
+        call_command('feed_paths', '--push', stdout=out)
+        self.assertIn('pull: 1\n  star\t2', out.getvalue())
+        self.assertIn('push: 1\n  author\t1', out.getvalue())
+
+    def test_feed_paths_with_drifted_counters(self):
+        """Проверка: счётчик без подписок не ломает вывод feed_paths."""
+        UserStats.objects.filter(user=self.fan).update(followers_count=1)
+        out = StringIO()
+        call_command('feed_paths', '--push', stdout=out)
+        self.assertIn('  fan\t1', out.getvalue())
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other_author = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+            description='test_description',
+        )
+        cls.other_group = Group.objects.create(
+            title='other_group',
+            slug='other_slug',
+            description='other_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='text_post', group=cls.group)
+        cls.other_post = Post.objects.create(
+            author=cls.other_author, text='other_post',
+            group=cls.other_group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def assertCacheStatus(self, url, status):
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], status)
+        return response
+
+    def test_anonymous_pages_are_cached(self):
+        """Проверка: повторный запрос анонима отдается из кэша."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.assertCacheStatus(url, 'MISS')
+                second = self.assertCacheStatus(url, 'HIT')
+                self.assertEqual(first.content, second.content)
+                self.assertCacheStatus(url + '?page=1', 'MISS')
+        self.assertEqual(page_cache.stats(), {'hits': 4, 'misses': 8})
+
+    def test_authorized_pages_are_not_cached(self):
+        """Проверка: страницы авторизованных пользователей не кэшируются."""
+        client = Client()
+        client.force_login(self.author)
+        client.get(reverse('posts:index'))
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_comment_purges_only_dependent_pages(self):
+        """Проверка: комментарий сбрасывает только зависимые страницы."""
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        other_detail = reverse(
+            'posts:post_detail', kwargs={'post_id': self.other_post.pk})
+        other_group = reverse(
+            'posts:group_list', kwargs={'slug': self.other_group.slug})
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in (detail, other_detail, other_group, *feeds):
+            self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        response = self.assertCacheStatus(detail, 'MISS')
+        self.assertContains(response, 'Комментарий')
+        for url in (other_detail, other_group, *feeds):
+            with self.subTest(url=url):
+                self.assertCacheStatus(url, 'HIT')
+
+    def test_rename_purges_index_and_own_pages(self):
+        """Проверка: смена имени или адреса группы сбрасывает их ленты."""
+        index = reverse('posts:index')
+        self.guest_client.get(index)
+        author = User.objects.get(pk=self.author.pk)
+        author.last_login = timezone.now()
+        author.save(update_fields=('last_login',))
+        self.assertCacheStatus(index, 'HIT')
+        author.username = 'renamed'
+        author.save()
+        response = self.assertCacheStatus(index, 'MISS')
+        self.assertContains(response, 'renamed')
+        self.assertCacheStatus(
+            reverse('posts:profile', kwargs={'username': 'renamed'}), 'MISS')
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed_slug'
+        group.save()
+        response = self.assertCacheStatus(index, 'MISS')
+        self.assertContains(response, 'renamed_slug')
+
+    def test_rename_purges_pages_of_other_scopes(self):
+        """Проверка: новое имя видно и на страницах чужих лент."""
+        Comment.objects.create(
+            post=self.post, author=self.other_author, text='Комментарий')
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        comments = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk})
+        # Адрес группы уже новый: первым меняется он.
+        group_page = reverse('posts:group_list', kwargs={'slug': 'new_slug'})
+        cases = (
+            (Group, self.group.pk, 'slug', 'new_slug',
+             (profile, detail), '/group/new_slug/'),
+            (User, self.author.pk, 'first_name', 'Автор',
+             (group_page,), 'Автор'),
+            (User, self.other_author.pk, 'username', 'commenter',
+             (detail, comments), 'commenter'),
+        )
+        for model, pk, field, value, urls, shown in cases:
+            for url in urls:
+                self.guest_client.get(url)
+            instance = model.objects.get(pk=pk)
+            setattr(instance, field, value)
+            instance.save()
+            for url in urls:
+                with self.subTest(field=field, url=url):
+                    response = self.assertCacheStatus(url, 'MISS')
+                    self.assertContains(response, shown)
+
+
+class QueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+            description='test_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='text_post', group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def add_content(self, number):
+        """Посты и комментарии разных авторов в разных группах."""
+        for index in range(number):
+            author = User.objects.create_user(username=f'user_{index}')
+            Follow.objects.create(user=self.reader, author=author)
+            group = Group.objects.create(
+                title=f'group_{index}',
+                slug=f'slug_{index}',
+                description='description',
+            )
+            Post.objects.create(author=author, text='text', group=group)
+            Post.objects.create(
+                author=self.author, text='text', group=self.group)
+            Comment.objects.create(
+                post=self.post, author=author, text='Комментарий')
+
+    def test_views_run_fixed_number_of_queries(self):
+        """Проверка: число запросов не зависит от постов и комментариев."""
+        # Авторизованному: сессия и пользователь + запросы самой страницы.
+        pages = (
+            (self.guest_client, reverse('posts:index'), 1),
+            (self.reader_client, reverse('posts:index'), 3),
+            (self.guest_client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}), 2),
+            (self.reader_client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}), 4),
+            (self.guest_client, reverse(
+                'posts:profile', kwargs={'username': self.author}), 2),
+            (self.reader_client, reverse(
+                'posts:profile', kwargs={'username': self.author}), 5),
+            (self.guest_client, reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}), 2),
+            (self.reader_client, reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}), 4),
+            (self.reader_client, reverse('posts:follow_index'), 4),
+            (self.author_client, reverse(
+                'posts:post_edit', kwargs={'post_id': self.post.pk}), 4),
+            (self.author_client, reverse('posts:post_create'), 3),
+        )
+        for number in (0, POSTS_NUMBER * 2):
+            self.add_content(number)
+            for client, url, queries in pages:
+                with self.subTest(url=url, posts=number):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        client.get(url)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='text_post')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(COMMENTS_NUMBER + 5)
+        )
+        cls.comments = list(cls.post.comments.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.fragment_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk})
+
+    def test_post_detail_shows_newest_comments(self):
+        """Проверка: на странице поста только первая порция комментариев."""
+        response = self.guest_client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments), self.comments[:COMMENTS_NUMBER])
+        self.assertContains(
+            response, f'{self.fragment_url}?after='
+            f'{comments.paginator.next_cursor}')
+
+    def test_load_more_returns_next_fragment(self):
+        """Проверка: "показать ещё" отдаёт следующую порцию фрагментом."""
+        after = self.guest_client.get(
+            self.detail_url).context['comments'].paginator.next_cursor
+        response = self.guest_client.get(
+            self.fragment_url, {'after': after})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            list(response.context['comments']),
+            self.comments[COMMENTS_NUMBER:])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_comment_page_runs_fixed_queries(self):
+        """Проверка: порция стоит одинаково в любом месте ветки."""
+        after = self.guest_client.get(
+            self.detail_url).context['comments'].paginator.next_cursor
+        for params in ({}, {'after': after}):
+            with self.subTest(params=params):
+                cache.clear()
+                with self.assertNumQueries(2):
+                    self.guest_client.get(self.fragment_url, params)
@@ -0,0 +1,251 @@
+"""
+Миниатюры картинок постов, подготовленные заранее.
+
+Шаблоны не режут картинки во время запроса: они только читают готовые
+миниатюры из хранилища sorl-thumbnail (LookupBackend) и показывают заглушку,
+пока их нет. Картинка поста показывается в нескольких ширинах
+(VARIANTS) для srcset, в WebP и JPEG, если Pillow умеет WebP, иначе
+только в JPEG. Все варианты строит пул фоновых потоков: после
+сохранения поста через PostForm, а также для картинки, миниатюр
+которой не нашлось при показе. Для страниц лент миниатюры всех постов
+ищутся разом (prefetch).
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import activity, feed_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Пропорции картинки в карточке поста и ширина основного варианта,
+# который идёт в src для браузеров без srcset.
+ASPECT = (960, 339)
+BASE_WIDTH = 960
+WIDTHS = (480, 960, 1440)
+FORMATS = ('WEBP', 'JPEG') if features.check('webp') else ('JPEG',)
+FALLBACK_FORMAT = 'JPEG'
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+QUALITY = 80
+# Ширина картинки в вёрстке: на широком экране - контейнер bootstrap.
+SIZES = '(min-width: 1200px) 1110px, 100vw'
+# Сколько не проверять заново исходник, миниатюр которого нет.
+MISS_TIMEOUT = 60 * 5
+
+
+def _geometry(width):
+    return f'{width}x{round(width * ASPECT[1] / ASPECT[0])}'
+
+
+# Варианты картинки: (формат, ширина) -> (геометрия, опции sorl).
+# Увеличивать исходник имеет смысл только до основной ширины.
+VARIANTS = {
+    (format_, width): (_geometry(width), {
+        'crop': 'center',
+        'upscale': width <= BASE_WIDTH,
+        'format': format_,
+        'quality': QUALITY,
+    })
+    for format_ in FORMATS
+    for width in WIDTHS
+}
+
+_lock = threading.Lock()
+_pending = set()
+_executor = None
+
+
+class LookupBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl-thumbnail, который только ищет готовые миниатюры.
+
+    Имя миниатюры считается закрытыми методами ThumbnailBackend
+    (_get_format, _get_thumbnail_filename, extra_options): открытого
+    API для этого нет, поэтому версия sorl-thumbnail закреплена
+    в requirements.txt.
+    """
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры с тем же именем, что даст get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = LookupBackend()
+
+
+def _files(image):
+    return [
+        backend.thumbnail_file(image, geometry, **options)
+        for geometry, options in VARIANTS.values()
+    ]
+
+
+def prefetch(posts):
+    """
+    Находит все варианты картинок постов страницы одним обращением
+    к хранилищу и запоминает их в post.prefetched_thumbnails
+    (вариант -> ImageFile или None). Отсутствующие ставит в очередь.
+    """
+    posts = [post for post in posts if post.image]
+    files = [thumbnail for post in posts for thumbnail in _files(post.image)]
+    kvstore = default.kvstore
+    if hasattr(kvstore, 'get_many'):
+        found = iter(kvstore.get_many(files))
+    else:
+        found = (kvstore.get(thumbnail) for thumbnail in files)
+    missing = []
+    for post in posts:
+        post.prefetched_thumbnails = {
+            variant: next(found) for variant in VARIANTS}
+        if None in post.prefetched_thumbnails.values():
+            missing.append(post.image)
+    if missing:
+        _schedule_missing(missing)
+
+
+def _miss_key(name):
+    return 'thumbnails:miss:{}'.format(
+        hashlib.md5(name.encode()).hexdigest())
+
+
+def _schedule_missing(images):
+    """
+    Ставит в очередь картинки без миниатюр. Исходник проверяется
+    в хранилище раз в MISS_TIMEOUT: промах запоминается в кэше, чтобы
+    удалённый файл не проверялся на каждом показе.
+    """
+    keys = {_miss_key(image.name): image for image in images}
+    known = cache.get_many(keys)
+    for key, image in keys.items():
+        if key in known:
+            continue
+        cache.set(key, True, MISS_TIMEOUT)
+        if _exists(image):
+            schedule(image.name)
+
+
+def picture(post):
+    """
+    Данные для <picture> картинки поста или None, пока основной
+    вариант не готов: src, srcset и sizes для <img> и sources
+    с srcset остальных форматов.
+    """
+    if not post.image:
+        return None
+    if not hasattr(post, 'prefetched_thumbnails'):
+        prefetch([post])
+    found = post.prefetched_thumbnails
+    fallback = found[FALLBACK_FORMAT, BASE_WIDTH]
+    if fallback is None:
+        return None
+    srcsets = {}
+    for format_ in FORMATS:
+        widths = {}
+        for width in WIDTHS:
+            thumbnail = found[format_, width]
+            if thumbnail is not None:
+                widths.setdefault(thumbnail.width, thumbnail.url)
+        srcsets[format_] = ', '.join(
+            f'{url} {width}w' for width, url in sorted(widths.items()))
+    return {
+        'src': fallback.url,
+        'width': fallback.width,
+        'height': fallback.height,
+        'srcset': srcsets[FALLBACK_FORMAT],
+        'sizes': SIZES,
+        'sources': [
+            {'type': MIME_TYPES[format_], 'srcset': srcsets[format_]}
+            for format_ in FORMATS
+            if format_ != FALLBACK_FORMAT and srcsets[format_]
+        ],
+    }
+
+
+def _exists(image):
+    try:
+        return image.storage.exists(image.name)
+    except (SuspiciousFileOperation, OSError):
+        return False
+
+
+def generate(name):
+    """
+    Строит все варианты картинки и сбрасывает кэш и отметки изменений
+    страниц, на которых вместо неё стояла заглушка.
+    """
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    for geometry, options in VARIANTS.values():
+        get_thumbnail(source, geometry, **options)
+    cache.delete(_miss_key(name))
+    posts = list(Post.objects.filter(image=name))
+    for post in posts:
+        feed_cache.invalidate_post(post)
+    # Иначе условный GET так и отвечал бы 304 на страницу с заглушкой.
+    activity.touch(
+        post_ids=[post.pk for post in posts],
+        group_ids=[post.group_id for post in posts],
+        author_ids=[post.author_id for post in posts])
+
+
+def _run(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _work(name):
+    try:
+        _run(name)
+    finally:
+        # У каждого потока пула своё соединение с базой.
+        connection.close()
+
+
+def _submit(name):
+    global _executor
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if settings.THUMBNAIL_WORKERS and _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+    if settings.THUMBNAIL_WORKERS:
+        _executor.submit(_work, name)
+    else:
+        _run(name)
+
+
+def schedule(name):
+    """
+    Ставит построение миниатюр в очередь после фиксации транзакции:
+    фоновый поток должен видеть уже сохранённую запись.
+    """
+    transaction.on_commit(lambda: _submit(name))
@@ -0,0 +1,144 @@
+"""
+Ленты подписок: гибрид fan-out on write и fan-out on read.
+
+Посты обычных авторов раскладываются по входящим лентам подписчиков
+при публикации. Авторы, у которых подписчиков больше
+settings.FEED_PULL_THRESHOLD, ничего не раскладывают: их посты
+подмешиваются в ленту при чтении.
+
+Какие авторы на чтении, хранит флаг UserStats.pull. Его пересчитывает
+команда feed_paths (по расписанию), а не запросы: тем, кто вернулся
+на раскладку, она же дописывает посты в ленты подписчиков.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import follow_graph
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import CursorPaginator, MergedCursorPaginator
+
+TIMELINE_BATCH_SIZE = 500
+TIMELINE_KEYS = ('pub_date', 'post_id')
+PULL_AUTHORS_KEY = 'feed:pull_authors'
+PULL_AUTHORS_TIMEOUT = 60
+
+
+def _insert(entries):
+    """Вставляет записи пачками, не держа в памяти весь генератор."""
+    while True:
+        batch = list(islice(entries, TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def follower_counts():
+    """Число подписчиков по авторам: {author_id: followers}."""
+    return dict(UserStats.objects.filter(followers_count__gt=0).values_list(
+        'user_id', 'followers_count'))
+
+
+def refresh_pull_authors():
+    """
+    Пересчитывает флаги авторов на чтении по числу подписчиков.
+
+    Тем, кто вернулся на раскладку, дописывает в ленты посты, которые
+    раньше подмешивались при чтении.
+    """
+    authors = frozenset(
+        author_id for author_id, followers in follower_counts().items()
+        if followers > settings.FEED_PULL_THRESHOLD
+    )
+    flagged = set(UserStats.objects.filter(pull=True).values_list(
+        'user_id', flat=True))
+    UserStats.objects.filter(user_id__in=authors - flagged).update(pull=True)
+    UserStats.objects.filter(user_id__in=flagged - authors).update(pull=False)
+    for author_id in flagged - authors:
+        for user_id in Follow.objects.filter(
+                author_id=author_id).values_list('user_id', flat=True):
+            _backfill(user_id, author_id)
+    cache.delete(PULL_AUTHORS_KEY)
+    return authors
+
+
+def pull_authors():
+    """Авторы, чьи посты читаются при показе ленты, а не раскладываются."""
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(UserStats.objects.filter(
+            pull=True).values_list('user_id', flat=True))
+        cache.set(PULL_AUTHORS_KEY, authors, PULL_AUTHORS_TIMEOUT)
+    return authors
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    if post.author_id in pull_authors():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def _backfill(user_id, author_id):
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=pk,
+                      author_id=author_id, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if author_id not in pull_authors():
+        _backfill(user_id, author_id)
+
+
+def rebuild():
+    """
+    Дозаполняет ленты всех подписчиков, например после массовой
+    загрузки в обход сигналов. Уже разложенные записи не дублируются.
+    """
+    refresh_pull_authors()
+    for user_id, author_id in Follow.objects.values_list(
+            'user_id', 'author_id').iterator():
+        backfill(user_id, author_id)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_paginator(user, per_page):
+    """
+    Пагинатор ленты подписок: входящая лента пользователя, слитая
+    с постами авторов на чтении, на которых он подписан.
+    """
+    pulled = pull_authors()
+    pulled_ids = []
+    if pulled:
+        pulled_ids = [
+            author_id for author_id in follow_graph.following(user.pk)
+            if author_id in pulled]
+    entries = TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group')
+    if not pulled_ids:
+        return CursorPaginator(
+            entries, per_page, keys=TIMELINE_KEYS, related='post')
+    return MergedCursorPaginator((
+        CursorPaginator(
+            entries.exclude(author_id__in=pulled_ids), per_page,
+            keys=TIMELINE_KEYS, related='post'),
+        CursorPaginator(
+            Post.objects.filter(author_id__in=pulled_ids).select_related(
+                'author', 'group'), per_page),
+    ), per_page)
@@ -0,0 +1,344 @@
+"""
+Выгрузка и загрузка данных posts в JSONL или CSV.
+
+Каждая модель - отдельный файл в каталоге (groups, posts, comments,
+follows). Пользователи и группы записываются по username и slug, посты
+и комментарии - со своими id, чтобы комментарии ссылались на посты
+без таблицы соответствия. Выгрузка читает базу через
+iterator(chunk_size), загрузка идёт пачками bulk_create: внешние ключи
+пачки ищутся одним запросом на модель, в памяти - только одна пачка.
+
+Строки, которые уже есть в базе, отсеиваются до вставки одним
+запросом на пачку: так прогресс считает только вставленные строки.
+bulk_create не шлёт сигналов, поэтому после загрузки finish()
+пересчитывает счётчики, дописывает в ленты подписок только новые
+подписки и посты и сдвигает поколения кэша затронутых лент.
+"""
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import activity, counters, feed_cache, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+JSONL = 'jsonl'
+CSV = 'csv'
+FORMATS = (JSONL, CSV)
+# Порядок важен: посты ссылаются на группы, комментарии - на посты.
+COLUMNS = {
+    'groups': (
+        ('slug', 'slug'),
+        ('title', 'title'),
+        ('description', 'description'),
+    ),
+    'posts': (
+        ('id', 'id'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+        ('image', 'image'),
+    ),
+    'comments': (
+        ('id', 'id'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+    ),
+    'follows': (
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    ),
+}
+MODELS = {
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+# Уникальные поля, по которым строка файла совпадает со строкой базы.
+KEYS = {
+    'groups': ('slug',),
+    'posts': ('id',),
+    'comments': ('id',),
+    'follows': ('user_id', 'author_id'),
+}
+
+
+def path(directory, name, format_):
+    return os.path.join(directory, f'{name}.{format_}')
+
+
+class Progress:
+    """Число строк и скорость; report вызывается после каждой пачки."""
+
+    def __init__(self, name, report=None):
+        self.name = name
+        self.report = report
+        self.rows = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def add(self, rows, skipped=0):
+        self.rows += rows
+        self.skipped += skipped
+        if self.report is not None:
+            self.report(self)
+
+
+def _value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_rows(name, chunk_size):
+    """Строки модели в виде словарей, от старых к новым."""
+    columns = COLUMNS[name]
+    queryset = MODELS[name].objects.order_by('pk').values_list(
+        *(lookup for _, lookup in columns))
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            column: _value(value)
+            for (column, _), value in zip(columns, row)
+        }
+
+
+def write(name, rows, file, format_, progress, chunk_size):
+    if format_ == CSV:
+        writer = csv.DictWriter(
+            file, fieldnames=[column for column, _ in COLUMNS[name]])
+        writer.writeheader()
+        write_row = writer.writerow
+    else:
+        def write_row(row):
+            file.write(json.dumps(row, ensure_ascii=False) + '\n')
+    written = 0
+    for written, row in enumerate(rows, 1):
+        write_row(row)
+        if written % chunk_size == 0:
+            progress.add(chunk_size)
+    progress.add(written % chunk_size)
+
+
+def export(directory, format_=JSONL, chunk_size=2000, report=None):
+    """Выгружает все модели в каталог; возвращает Progress по моделям."""
+    os.makedirs(directory, exist_ok=True)
+    done = []
+    for name in COLUMNS:
+        progress = Progress(name, report)
+        with open(path(directory, name, format_), 'w', newline='',
+                  encoding='utf-8') as file:
+            write(name, export_rows(name, chunk_size), file, format_,
+                  progress, chunk_size)
+        done.append(progress)
+    return done
+
+
+def read(file, format_):
+    if format_ == CSV:
+        for row in csv.DictReader(file):
+            # В CSV нет null: пустая группа поста - пост без группы.
+            if row.get('group') == '':
+                row['group'] = None
+            yield row
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _batches(rows, size):
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_dates():
+    """
+    bulk_create проставил бы pub_date = now из-за auto_now_add:
+    на время загрузки даты берутся из файла.
+    """
+    fields = [model._meta.get_field('pub_date') for model in (Post, Comment)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Загружает файлы каталога пачками и помнит, какие ленты затронул."""
+
+    def __init__(self, batch_size=1000, create_users=False, report=None):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.report = report
+        self.group_ids = set()
+        self.author_ids = set()
+        self.follows_added = set()
+
+    def users(self, usernames):
+        """{username: id} для пачки, при create_users - с новыми."""
+        usernames = set(filter(None, usernames))
+        found = dict(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        missing = usernames - found.keys()
+        if missing and self.create_users:
+            password = make_password(None)
+            User.objects.bulk_create(
+                (User(username=username, password=password)
+                 for username in missing), ignore_conflicts=True)
+            found.update(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+        return found
+
+    def groups(self, batch):
+        return [Group(slug=row['slug'], title=row['title'],
+                      description=row['description']) for row in batch]
+
+    def posts(self, batch):
+        users = self.users(row['author'] for row in batch)
+        groups = dict(Group.objects.filter(
+            slug__in={row['group'] for row in batch if row['group']},
+        ).values_list('slug', 'pk'))
+        objects = []
+        for row in batch:
+            if row['author'] not in users or (
+                    row['group'] and row['group'] not in groups):
+                continue
+            objects.append(Post(
+                id=int(row['id']), author_id=users[row['author']],
+                group_id=groups.get(row['group']), text=row['text'],
+                pub_date=parse_datetime(row['pub_date']),
+                image=row['image'] or ''))
+        return objects
+
+    def comments(self, batch):
+        users = self.users(row['author'] for row in batch)
+        posts = set(Post.objects.filter(
+            pk__in={int(row['post']) for row in batch},
+        ).values_list('pk', flat=True))
+        return [
+            Comment(id=int(row['id']), post_id=int(row['post']),
+                    author_id=users[row['author']], text=row['text'],
+                    pub_date=parse_datetime(row['pub_date']))
+            for row in batch
+            if row['author'] in users and int(row['post']) in posts
+        ]
+
+    def follows(self, batch):
+        users = self.users(
+            username for row in batch
+            for username in (row['user'], row['author']))
+        return [
+            Follow(user_id=users[row['user']],
+                   author_id=users[row['author']])
+            for row in batch
+            if row['user'] in users and row['author'] in users
+        ]
+
+    def new(self, name, objects):
+        """Объекты пачки, которых ещё нет в базе, без повторов."""
+        fields = KEYS[name]
+        existing = set(MODELS[name].objects.filter(**{
+            f'{field}__in': {getattr(obj, field) for obj in objects}
+            for field in fields
+        }).values_list(*fields))
+        added = []
+        for obj in objects:
+            key = tuple(getattr(obj, field) for field in fields)
+            if key not in existing:
+                existing.add(key)
+                added.append(obj)
+        return added
+
+    def track(self, name, objects):
+        """Запоминает, какие ленты задели вставленные строки."""
+        if name == 'posts':
+            for post in objects:
+                self.author_ids.add(post.author_id)
+                if post.group_id is not None:
+                    self.group_ids.add(post.group_id)
+        elif name == 'follows':
+            self.follows_added.update(
+                (follow.user_id, follow.author_id) for follow in objects)
+
+    def load(self, name, rows):
+        model = MODELS[name]
+        build = getattr(self, name)
+        progress = Progress(name, self.report)
+        with keep_dates():
+            for batch in _batches(rows, self.batch_size):
+                with transaction.atomic():
+                    objects = self.new(name, build(batch))
+                    model.objects.bulk_create(objects, ignore_conflicts=True)
+                self.track(name, objects)
+                progress.add(len(objects), len(batch) - len(objects))
+        return progress
+
+    def run(self, directory, format_=JSONL):
+        """Загружает файлы моделей, которые есть в каталоге."""
+        done = []
+        for name in COLUMNS:
+            filename = path(directory, name, format_)
+            if not os.path.exists(filename):
+                continue
+            with open(filename, newline='', encoding='utf-8') as file:
+                done.append(self.load(name, read(file, format_)))
+        self.finish()
+        return done
+
+    def finish(self):
+        """Что при обычной записи делают сигналы - одним проходом."""
+        with connection.cursor() as cursor:
+            # Посты и комментарии пришли с id: счётчики id в PostgreSQL
+            # надо сдвинуть за них.
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Post, Comment]):
+                cursor.execute(sql)
+        with transaction.atomic():
+            counters.recount()
+        timeline.refresh_pull_authors()
+        self.backfill()
+        activity.touch(group_ids=self.group_ids, author_ids=self.author_ids)
+        feed_cache.bump(
+            feed_cache.INDEX,
+            *(feed_cache.group_scope(pk) for pk in self.group_ids),
+            *(feed_cache.author_scope(pk) for pk in self.author_ids))
+
+    def backfill(self):
+        """
+        Дописывает ленты подписок: новым подпискам - все посты автора,
+        подписчикам авторов с новыми постами - их посты. Остальные ленты
+        не трогаются.
+        """
+        for user_id, author_id in self.follows_added:
+            timeline.backfill(user_id, author_id)
+        followers = Follow.objects.filter(
+            author_id__in=self.author_ids).values_list('user_id', 'author_id')
+        for pair in followers.iterator():
+            if pair not in self.follows_added:
+                timeline.backfill(*pair)
@@ -1,65 +1,156 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.cache import never_cache
 
-from .forms import CommentForm, PostForm
+from . import (archive, conditional, counters, feed_cache, follow_graph,
+               page_cache)
+from .forms import CommentForm, PostForm, SearchForm
 from .models import Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .search import SearchResults
+from .timeline import feed_paginator
 
 POSTS_NUMBER = 10
+COMMENTS_NUMBER = 20
 
 
-def page_context(queryset, request):
-    paginator = Paginator(queryset, POSTS_NUMBER)
+def paginate(paginator, request):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def page_context(queryset, request, count=None):
+    return paginate(
+        CursorPaginator(queryset, POSTS_NUMBER, count=count), request)
 
 
+def comments_page(post, request):
+    """Порция комментариев от новых к старым после курсора ?after."""
+    return CursorPaginator(
+        post.comments.select_related('author'), COMMENTS_NUMBER,
+    ).get_cursor_page(after=request.GET.get('after'))
+
+
+@page_cache.cache_anonymous_page
 def index(request):
+    page_cache.tag(request, feed_cache.INDEX, feed_cache.NAMES)
     context = {'page_obj': page_context(
         Post.objects.select_related(
             'author', 'group'
         ), request)}
+    context.update(feed_cache.context(feed_cache.INDEX, feed_cache.NAMES))
     return render(request, 'posts/index.html', context)
 
 
+@page_cache.cache_anonymous_page
+@conditional.page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
+    page_cache.tag(
+        request, feed_cache.group_scope(group.pk), feed_cache.NAMES)
+    not_modified = conditional.check(request, group.last_activity)
+    if not_modified is not None:
+        return not_modified
     context = {
         'group': group,
         'page_obj': page_context(group.posts.select_related(
             'author', 'group',
-        ), request)
+        ), request, count=group.posts_count),
+        **feed_cache.context(
+            feed_cache.group_scope(group.pk), feed_cache.NAMES),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@page_cache.cache_anonymous_page
+@conditional.page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    page_cache.tag(
+        request, feed_cache.author_scope(author.pk), feed_cache.NAMES)
+    not_modified = conditional.check(
+        request, counters.user_stats(author).last_activity)
+    if not_modified is not None:
+        return not_modified
     following = request.user.is_authenticated and (
-        Follow.objects.filter(
-            user=request.user, author=author).exists())
+        follow_graph.is_following(request.user.pk, author.pk))
     context = {
         'author': author,
         'page_obj': page_context(
-            author.posts.select_related('group',), request),
+            author.posts.select_related('group',), request,
+            count=author.stats.posts_count),
         'following': following,
+        **feed_cache.context(
+            feed_cache.author_scope(author.pk), feed_cache.NAMES),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@page_cache.cache_anonymous_page
+@conditional.page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    page_cache.tag(request, feed_cache.post_scope(post_id), feed_cache.NAMES)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    page_cache.tag(request, feed_cache.author_scope(post.author_id))
+    # На странице и счётчик постов автора, и название группы.
+    not_modified = conditional.check(
+        request, post.updated, counters.user_stats(post.author).last_activity,
+        post.group.last_activity if post.group_id else None)
+    if not_modified is not None:
+        return not_modified
     form = CommentForm()
     context = {
         'post': post,
-        'comments': comments,
+        'comments': comments_page(post, request),
         'form': form,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@page_cache.cache_anonymous_page
+def post_comments(request, post_id):
+    page_cache.tag(request, feed_cache.post_scope(post_id), feed_cache.NAMES)
+    post = get_object_or_404(Post, pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post, request),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@page_cache.cache_anonymous_page
+def search(request):
+    page_cache.tag(request, feed_cache.INDEX, feed_cache.NAMES)
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        results = SearchResults(
+            form.cleaned_data['q'],
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+        )
+        page_obj = Paginator(results, POSTS_NUMBER).get_page(
+            request.GET.get('page'))
+    query = request.GET.copy()
+    query.pop('page', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'page_query': query.urlencode(),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -80,7 +171,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post.pk)
     form = PostForm(
         request.POST or None,
@@ -112,9 +203,9 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
     context = {
-        'page_obj': page_context(posts, request),
+        'page_obj': paginate(
+            feed_paginator(request.user, POSTS_NUMBER), request),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -124,7 +215,13 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(user=user, author=author)
+        # Вместо get_or_create сразу вставка: повтор отсекает
+        # уникальность пары.
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=author)
+        except IntegrityError:
+            pass
     return redirect('posts:follow_index')
 
 
@@ -134,3 +231,13 @@ def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user, author=author).delete()
     return redirect('posts:follow_index')
+
+
+@never_cache
+@login_required
+def account_archive(request):
+    response = StreamingHttpResponse(
+        archive.stream(request.user), content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="{archive.filename(request.user)}"')
+    return response
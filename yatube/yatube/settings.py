@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,7 +65,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -142,8 +144,120 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Поколения лент, страницы и подписки должны быть общими для всех
+# процессов: для этого нужен memcached (адреса через запятую
+# в CACHE_LOCATION, пакет python-memcached). Без него у каждого процесса
+# свой LocMem, и чужие изменения доходят только по истечении TTL.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+SHARED_CACHE = bool(CACHE_LOCATION)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.InstrumentedCache',
+        'LOCATION': CACHE_LOCATION.split(',') if SHARED_CACHE else '',
+        'OPTIONS': {
+            'BACKEND': (
+                'django.core.cache.backends.memcached.MemcachedCache'
+                if SHARED_CACHE
+                else 'django.core.cache.backends.locmem.LocMemCache'
+            ),
+        },
     }
 }
+
+# TTL кэшей, которые сбрасываются сигналами, при кэше в процессе:
+# сигнал сбрасывает только кэш своего процесса.
+LOCAL_CACHE_TIMEOUT = 60
+
+# Авторы, у которых подписчиков больше порога, не раскладывают посты
+# по лентам подписчиков: посты подмешиваются в ленту при чтении.
+FEED_PULL_THRESHOLD = 1000
+
+# Фрагменты лент сбрасываются сигналами при изменении постов,
+# поэтому с общим кэшем TTL может быть долгим.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else LOCAL_CACHE_TIMEOUT
+
+# Подписки в кэше сбрасывают сигналы Follow (и ещё раз после фиксации
+# транзакции), поэтому с общим кэшем TTL может быть долгим.
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 if SHARED_CACHE else LOCAL_CACHE_TIMEOUT
+
+# Страницы для анонимов сбрасываются теми же сигналами, что и фрагменты.
+PAGE_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else LOCAL_CACHE_TIMEOUT
+
+# Бюджеты SQL-запросов: 'log' пишет превышения в лог вместе с SQL,
+# 'raise' бросает исключение (тесты), 'off' отключает подсчёт.
+QUERY_BUDGET_MODE = 'log'
+# Запросы сессии и пользователя входят в бюджет. Нумерованные
+# страницы (?page=N) добавляют COUNT там, где нет счётчика.
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 4,
+    'posts:profile': 5,
+    'posts:post_detail': 4,
+    'posts:post_comments': 4,
+    'posts:search': 7,
+    # Запас на промах кэша авторов на чтении и на слияние их постов.
+    'posts:follow_index': 7,
+    # Запас на раскладку поста пачками по лентам подписчиков.
+    'posts:post_create': {'GET': 3, 'POST': 12},
+    # Плюс сдвиг отметок изменений поста, группы и автора (activity).
+    'posts:post_edit': {'GET': 4, 'POST': 9},
+    'posts:add_comment': {'GET': 3, 'POST': 9},
+    'posts:profile_follow': 11,
+    'posts:profile_unfollow': 9,
+    # Сам архив читается уже после ответа, при отдаче.
+    'posts:account_archive': 2,
+    # Плюс отметка ленты для ETag: последний пост и отметки по индексам.
+    'posts:api_index': 2,
+    'posts:api_group_list': 3,
+    'posts:api_profile': 3,
+    'posts:api_follow_index': 7,
+    'posts:index_rss': 3,
+    'posts:index_atom': 3,
+    'posts:group_rss': 4,
+    'posts:group_atom': 4,
+    'posts:profile_rss': 4,
+    'posts:profile_atom': 4,
+    'users:signup': {'GET': 2, 'POST': 6},
+    'users:login': {'GET': 2, 'POST': 7},
+    'users:logout': 4,
+    'users:password_change': {'GET': 2, 'POST': 10},
+    'users:password_change_done': 2,
+    'users:password_reset': 2,
+    'users:password_reset_done': 2,
+    'users:password_reset_confirm': 3,
+    'users:password_reset_complete': 2,
+    'about:author': 2,
+    'about:tech': 2,
+    'media': 0,
+}
+
+# Метрики /metrics (Prometheus) видны сотрудникам (is_staff) и по токену
+# в заголовке Authorization: Bearer <токен>. Без METRICS_TOKEN доступ
+# по токену выключен.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Как отдавать загруженные файлы (core.media): 'sendfile' - открытым
+# файлом через wsgi.file_wrapper WSGI-сервера, 'x-accel-redirect' -
+# внутренним адресом nginx, 'x-sendfile' - заголовком для Apache.
+MEDIA_SERVE_MODE = 'sendfile'
+# location nginx с internal, который смотрит в MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Сколько кэшировать файлы, имя которых не хэш содержимого.
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+# Сколько секунд не удалять только что записанный файл картинки: его
+# мог загрузить пост, который ещё не зафиксирован (posts.blobs).
+# Такие файлы удаляет потом команда sweep_media.
+MEDIA_RELEASE_GRACE = 60 * 60
+
+# Больше этого размера по большей стороне загруженные картинки
+# ужимаются при сохранении (posts.images).
+IMAGE_MAX_SIZE = 1920
+
+# Потоки, которые строят миниатюры картинок постов в фоне;
+# 0 - строить сразу после фиксации транзакции в том же потоке.
+THUMBNAIL_WORKERS = 2
+
+# Записи sorl-thumbnail о готовых миниатюрах: файл SQLite, общий
+# для всех процессов и переживающий их перезапуск.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_KVSTORE_FILE = os.path.join(BASE_DIR, 'thumbnails.sqlite3')